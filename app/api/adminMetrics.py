@@ -0,0 +1,42 @@
+from typing import Annotated
+
+from fastapi.routing import APIRouter
+from fastapi import Depends
+
+from .deps import CurrentUser, get_admin
+from ..core.admission import admission
+from ..core.pool_metrics import pool_metrics
+from ..core.security import hashing_metrics
+from ..schemas.adminMetrics import PoolStats, HashingStats, EventStats, AdmissionStats
+from ..services.events import event_bus
+
+
+router = APIRouter(prefix='/admin/metrics', tags=['Admin Metrics'])
+
+
+@router.get('/pool', response_model=PoolStats)
+async def pool_stats(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+) -> PoolStats:
+    return pool_metrics.snapshot()
+
+
+@router.get('/hashing', response_model=HashingStats)
+async def hashing_stats(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+) -> HashingStats:
+    return hashing_metrics.snapshot()
+
+
+@router.get('/events', response_model=EventStats)
+async def event_stats(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+) -> EventStats:
+    return event_bus.snapshot()
+
+
+@router.get('/admission', response_model=AdmissionStats)
+async def admission_stats(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+) -> AdmissionStats:
+    return admission.snapshot()
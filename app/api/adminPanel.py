@@ -1,94 +1,126 @@
-from typing import Annotated, List
+from datetime import date
+from typing import Annotated, Literal, Optional
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from fastapi.routing import APIRouter
-from fastapi import Depends, HTTPException, status
-from .deps import get_admin
+from fastapi import Depends, HTTPException, Query, status
+from .deps import CurrentUser, get_admin, invalidate_user
 from ..core.dependencies import get_db
+from ..core.pagination import PageParams, page_params, keyset, page_of
+from ..core.responses import columns_for
+from ..core.streaming import stream_format, stream_rows
 from ..models.user import User, Role
-from ..models.task import Task, TaskStatus
-from ..schemas.adminPanel import UserResponse, UserResponseDetalies, UserEditRole
+from ..models.task import UserTaskDaily, UserTaskStats
+from ..schemas.adminPanel import (
+    UserResponse, UserResponseDetalies, UserEditRole, UserTaskStatsResponse, TaskActivityResponse,
+)
+from ..schemas.pagination import Page
 
 
 router = APIRouter(prefix='/admin', tags=['Admin Panel Check Users'])
 
-@router.get('/users', response_model=List[UserResponse])
-def all_users(
-    admin: Annotated[User, Depends(get_admin)],
-    db: Annotated[Session, Depends(get_db)]
-) -> List[UserResponse]:
-    return db.query(User).all()
+USER_ORDER = (User.user_id,)
+ACTIVITY_ORDER = (UserTaskDaily.day,)
+STATUS_COUNTS = ('total', 'todo', 'doing', 'done')
 
+@router.get('/users', response_model=Page[UserResponse])
+async def all_users(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    stream: Annotated[Optional[str], Depends(stream_format)]
+) -> Page[UserResponse]:
+    if stream:
+        return stream_rows(db, select(*columns_for(User, UserResponse)).order_by(*USER_ORDER), stream)
 
-@router.get('/users_detalies', response_model=List[UserResponseDetalies])
-def all_users_detalies(
-    admin: Annotated[User, Depends(get_admin)],
-    db: Annotated[Session, Depends(get_db)]
-) -> List[UserResponseDetalies]:
-    return db.query(User).all()
+    users = await db.scalars(keyset(select(User), USER_ORDER, page))
+    return page_of(users, USER_ORDER, page)
+
+
+@router.get('/users_detalies', response_model=Page[UserResponseDetalies])
+async def all_users_detalies(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    stream: Annotated[Optional[str], Depends(stream_format)]
+) -> Page[UserResponseDetalies]:
+    if stream:
+        return stream_rows(db, select(*columns_for(User, UserResponseDetalies)).order_by(*USER_ORDER), stream)
+
+    users = await db.scalars(keyset(select(User), USER_ORDER, page))
+    return page_of(users, USER_ORDER, page)
 
 
 @router.put('/{pk}')
-def edit_role(
+async def edit_role(
     pk: int,
-    admin: Annotated[User, Depends(get_admin)],
-    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     role: UserEditRole
 ) -> UserResponse:
-    user = db.query(User).filter(User.user_id==pk).first()
-    
+    user = await db.get(User, pk)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='User not found'
         )
-    
+
     if role:
         user.role = role.role.value
-    
-    db.commit()
-    db.refresh(user)
-    
+
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user(user.user_id)
+
     return user
 
 
-@router.get('/filter_by_task')
-def filter_by_task(
-    admin: Annotated[User, Depends(get_admin)],
-    db: Annotated[Session, Depends(get_db)]
+@router.get('/filter_by_task', response_model=Page[UserTaskStatsResponse])
+async def filter_by_task(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    sort: Annotated[Literal['total', 'todo', 'doing', 'done'], Query()] = 'total',
+    order: Annotated[Literal['asc', 'desc'], Query()] = 'desc'
 ):
-    users_with_task_stats = (
-        db.query(
-            User.username,
-            func.count(Task.task_id).label("all_tasks"),
-            func.count(case((Task.status == TaskStatus.DONE, 1)))
-            .label("done"),
-            func.count(case((Task.status == TaskStatus.TODO, 1)))
-            .label("todo"),
-            func.count(case((Task.status == TaskStatus.DOING, 1)))
-            .label("doing"),
-        )
-        .outerjoin(Task, User.user_id == Task.user_id)
-        .filter(User.role != Role.ADMIN)
-        .group_by(User.user_id)
-        .order_by(func.count(Task.task_id).desc())  # ko'pdan kamga
-        .all()
+    # every user has a user_task_stats row (created with the user), so the page
+    # walks the (<sort>, user_id) index of the counters, the tasks table is never scanned
+    stats_order = (getattr(UserTaskStats, sort), UserTaskStats.user_id)
+
+    query = (
+        select(UserTaskStats.user_id, User.username, *(getattr(UserTaskStats, column) for column in STATUS_COUNTS))
+        .join(User, User.user_id == UserTaskStats.user_id)
+        .where(User.role != Role.ADMIN)
     )
+    rows = await db.execute(keyset(query, stats_order, page, descending=order == 'desc'))
+    return page_of(rows, stats_order, page)
+
+
+@router.get('/task_activity', response_model=Page[TaskActivityResponse])
+async def task_activity(
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    start: Annotated[Optional[date], Query()] = None,
+    end: Annotated[Optional[date], Query()] = None,
+    user_id: Annotated[Optional[int], Query()] = None,
+    order: Annotated[Literal['asc', 'desc'], Query()] = 'desc'
+):
+    # tasks created and completed per day from the user_task_daily rollup
+    query = select(
+        UserTaskDaily.day,
+        func.sum(UserTaskDaily.created).label('created'),
+        func.sum(UserTaskDaily.completed).label('completed'),
+    ).group_by(UserTaskDaily.day)
+
+    if start is not None:
+        query = query.where(UserTaskDaily.day >= start)
+    if end is not None:
+        query = query.where(UserTaskDaily.day <= end)
+    if user_id is not None:
+        query = query.where(UserTaskDaily.user_id == user_id)
 
-    response = []
-
-    for index, (
-        name, task_caunt, 
-        status_done, status_todo, 
-        status_doing
-    ) in enumerate(users_with_task_stats, start=1):
-        response.append({
-            "name": name,
-            "task_caunt": task_caunt,
-            "status_done": status_done,
-            "status_todo": status_todo,
-            "status_doing": status_doing
-        })
-
-    return response
+    rows = await db.execute(keyset(query, ACTIVITY_ORDER, page, descending=order == 'desc'))
+    return page_of(rows, ACTIVITY_ORDER, page)
@@ -1,149 +1,274 @@
 import os
 import shutil
 from uuid import uuid1
-from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.routing import APIRouter
-from fastapi import Depends, HTTPException, status, File, UploadFile, Form
-from supabase import create_client
+from fastapi import Depends, HTTPException, status, File, UploadFile, Form, Header, Request
 
 from ..core.config import settings
-from ..models.user import User
-from ..models.task import Task, Attechment
+from ..models.task import Attechment
 from ..core.dependencies import get_db
-from .deps import get_user
-from ..schemas.attechment import AttechmentResponse
+from ..core.http_cache import collection_etag, etag_matches, not_modified
+from ..core.storage import StorageError, delete_quietly, get_storage
+from ..core.pagination import PageParams, page_params, keyset, page_of
+from ..core.responses import rows_response
+from ..core.streaming import stream_format, stream_rows
+from ..core.uploads import (
+    iter_upload, too_large, offset_conflict,
+    create_session, load_session, append_chunks, iter_session, drop_session,
+)
+from .deps import CurrentUser, get_user
+from ..schemas.attechment import AttechmentResponse, UploadSessionResponse
+from ..schemas.pagination import Page
+from ..services.repository import attechments, tasks
+from ..services.tombstones import ATTACHMENT, bury
+from ..services.events import event_bus
+from ..services.signed_urls import attechment_urls as signed_urls, url_generation
+from ..services.task_expand import ATTECHMENT_COLUMNS
 
 router = APIRouter(prefix='/attechment', tags=['Attechment'])
-supabase = create_client(supabase_url=settings.supabase_url, supabase_key=settings.supabase_key)
 
+ATTECHMENT_ORDER = (Attechment.attechment_id,)
+
+
+def make_file_path(filename: str) -> str:
+    get_file_type = filename[::-1].split('.')[0][::-1]
 
-@router.post('/')
-def create_attechment(
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
-    att_file: Annotated[UploadFile, File()],
-    task_id: Annotated[int, Form()]
-) -> AttechmentResponse: 
-    
-    task = db.query(Task).filter(Task.task_id==task_id).first()
-    
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Task not found.'
-        )
-        
-    get_file_type = att_file.filename[::-1].split('.')[0][::-1]
-    
     create_file_path = f'{uuid1()}.{get_file_type}'
-    
+
     if len(create_file_path) >= 255:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='File name is too long.'
         )
-    
+
+    return create_file_path
+
+
+async def sign_file_paths(items: list[dict]) -> list[dict]:
+    # one signing call for every path not already cached
+    urls = await signed_urls.get_many(item['file_path'] for item in items)
+    for item in items:
+        item['file_path'] = urls.get(item['file_path'], '')
+    return items
+
+
+def storage_failed(e: StorageError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=str(e)
+    )
+
+
+async def insert_or_discard(db: AsyncSession, task_id: int, user_id: int, file_path: str):
+    # the object is already stored, without its row nothing would ever delete it;
+    # the session starts a new transaction here, none was held during the upload
+    try:
+        new_attechment = await attechments.insert_for_task(db, task_id, user_id, file_path=file_path)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await get_storage().delete('Attechments', [file_path])
+        raise
+    return new_attechment
+
+
+@router.post('/')
+async def create_attechment(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    att_file: Annotated[UploadFile, File()],
+    task_id: Annotated[int, Form()]
+) -> AttechmentResponse:
+
+    if not await tasks.exists(db, task_id, user.user_id):
+        raise tasks.missing()
+    # don't sit idle in transaction on a pooled connection for the whole upload
+    await db.rollback()
+
+    create_file_path = make_file_path(att_file.filename)
+
     # Save file locally
     # with open(create_file_path, 'wb') as f:
     #     shutil.copyfileobj(att_file.file, f)
-    
-    # Upload to Supabase Storage
-    supabase.storage.from_('Attechments').upload(create_file_path, att_file.file.read())
-    
-    public_url = supabase.storage.from_('Attechments').create_signed_url(create_file_path, 60*60*24*31)
-    
-    new_attechment = Attechment(
-        user_id=user.user_id,
-        file_path=create_file_path,
-        task_id=task_id
+
+    # Stream to storage, never holding the whole file in memory
+    try:
+        await get_storage().upload(
+            'Attechments', create_file_path,
+            iter_upload(att_file, settings.upload_max_size), att_file.content_type
+        )
+    except StorageError as e:
+        raise storage_failed(e)
+
+    new_attechment = await insert_or_discard(db, task_id, user.user_id, create_file_path)
+    event_bus.publish(user.user_id, ATTACHMENT, 'created', [new_attechment.attechment_id], task_id=task_id)
+
+    return AttechmentResponse(
+        attechment_id=new_attechment.attechment_id,
+        file_path=await signed_urls.get(create_file_path),
+        task_id=new_attechment.task_id
+    )
+
+
+@router.post('/uploads', response_model=UploadSessionResponse)
+async def start_upload(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    task_id: Annotated[int, Form()],
+    filename: Annotated[str, Form()],
+    size: Annotated[int, Form(ge=1)],
+    content_type: Annotated[str | None, Form()] = None
+) -> UploadSessionResponse:
+    if size > settings.upload_max_size:
+        raise too_large(settings.upload_max_size)
+
+    if not await tasks.exists(db, task_id, user.user_id):
+        raise tasks.missing()
+    await db.rollback()
+
+    upload_id = await create_session({
+        'user_id': user.user_id,
+        'task_id': task_id,
+        'file_path': make_file_path(filename),
+        'content_type': content_type,
+        'size': size,
+    })
+
+    return UploadSessionResponse(
+        upload_id=upload_id, offset=0, size=size, chunk_size=settings.upload_chunk_size
+    )
+
+
+@router.get('/uploads/{upload_id}', response_model=UploadSessionResponse)
+async def upload_status(
+    upload_id: str,
+    user: Annotated[CurrentUser, Depends(get_user)]
+) -> UploadSessionResponse:
+    meta, offset = await load_session(upload_id, user.user_id)
+
+    return UploadSessionResponse(
+        upload_id=upload_id, offset=offset, size=meta['size'], chunk_size=settings.upload_chunk_size
+    )
+
+
+@router.put('/uploads/{upload_id}', response_model=UploadSessionResponse)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    user: Annotated[CurrentUser, Depends(get_user)],
+    upload_offset: Annotated[int, Header(ge=0)]
+) -> UploadSessionResponse:
+    meta, offset = await load_session(upload_id, user.user_id)
+
+    # cheap early answer, append_chunks checks again under the session lock
+    if upload_offset != offset:
+        raise offset_conflict(offset)
+
+    offset = await append_chunks(upload_id, meta['size'], upload_offset, request.stream())
+
+    return UploadSessionResponse(
+        upload_id=upload_id, offset=offset, size=meta['size'], chunk_size=settings.upload_chunk_size
+    )
+
+
+@router.post('/uploads/{upload_id}/complete')
+async def complete_upload(
+    upload_id: str,
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)]
+) -> AttechmentResponse:
+    meta, offset = await load_session(upload_id, user.user_id)
+
+    if offset != meta['size']:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f'Upload is at offset {offset} of {meta["size"]}.'
+        )
+    # a token cache miss reads the user through this session, end that first
+    await db.rollback()
+
+    try:
+        await get_storage().upload(
+            'Attechments', meta['file_path'], iter_session(upload_id), meta['content_type']
+        )
+    except StorageError as e:
+        raise storage_failed(e)
+
+    new_attechment = await insert_or_discard(db, meta['task_id'], user.user_id, meta['file_path'])
+    await drop_session(upload_id)
+    event_bus.publish(
+        user.user_id, ATTACHMENT, 'created', [new_attechment.attechment_id], task_id=new_attechment.task_id
     )
-    
-    db.add(new_attechment)
-    db.commit()
-    db.refresh(new_attechment)
-    
+
     return AttechmentResponse(
         attechment_id=new_attechment.attechment_id,
-        file_path=public_url['signedURL'],
+        file_path=await signed_urls.get(new_attechment.file_path) or '',
         task_id=new_attechment.task_id
     )
-    
 
-@router.get('/user_attechments', response_model=list[AttechmentResponse])
-def get_user_attechments(
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)]
+
+@router.get('/user_attechments', response_model=Page[AttechmentResponse])
+async def get_user_attechments(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    stream: Annotated[Optional[str], Depends(stream_format)],
+    request: Request
 ):
-    attechments = db.query(Attechment).filter(Attechment.user_id==user.user_id).all()
-    
-    result = []
-    
-    for attechment in attechments:
-        expire_time = datetime.now() + timedelta(days=31)
-        expires_in = int((expire_time - datetime.now()).total_seconds())
-
-        signed_url = supabase.storage.from_('Attechments').create_signed_url(attechment.file_path, expires_in)
-        
-        result.append(AttechmentResponse(
-            attechment_id=attechment.attechment_id,
-            file_path=signed_url['signedURL'],
-            task_id=attechment.task_id
-        ))
-    
-    return result
+    etag, cache_headers = await collection_etag(
+        request, db, user.user_id, (Attechment,), stream, url_generation()
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_headers)
+
+    query = select(*ATTECHMENT_COLUMNS).where(Attechment.user_id==user.user_id)
+    if stream:
+        response = stream_rows(db, query.order_by(*ATTECHMENT_ORDER), stream, sign_file_paths)
+    else:
+        attechments = page_of(await db.execute(keyset(query, ATTECHMENT_ORDER, page)), ATTECHMENT_ORDER, page)
+        attechments['items'] = await sign_file_paths([row._asdict() for row in attechments['items']])
+        response = rows_response(attechments)
+
+    response.headers.update(cache_headers)
+    return response
 
 
 @router.get('/{pk}')
-def get_one_attechment(
+async def get_one_attechment(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)]
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)]
 ) -> AttechmentResponse:
-    attechment = db.query(Attechment).filter(Attechment.attechment_id==pk).first()
-    
-    if not attechment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Attechment not found'
-        )
-    
-    expire_time = datetime.now() + timedelta(days=31)
-    expires_in = int((expire_time - datetime.now()).total_seconds())
-
-    signed_url = supabase.storage.from_('Attechments').create_signed_url(attechment.file_path, expires_in)
+    attechment = await attechments.get(db, pk, user.user_id, *ATTECHMENT_COLUMNS)
 
     return AttechmentResponse(
         attechment_id=attechment.attechment_id,
-        file_path=signed_url,
+        file_path=await signed_urls.get(attechment.file_path) or '',
         task_id=attechment.task_id
     )
 
 
 @router.delete('/{pk}')
-def delete_attechment(
+async def delete_attechment(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> dict:
-    get_att_file = db.query(Attechment).filter(Attechment.attechment_id==pk).first()
-    
-    if not get_att_file:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Attechment not found'
-        )
-    
+    get_att_file = await attechments.delete(db, pk, user.user_id)
+    await bury(db, ATTACHMENT, pk, user.user_id)
+
+    await db.commit()
+
     # Delete locally
     # os.remove(get_att_file.file_path)
-    
-    # Delete from Supabase Storage
-    supabase.storage.from_('Attechments').remove([get_att_file.file_path])    
-    
-    db.delete(get_att_file)
-    db.commit()
-    
+
+    # Delete from storage
+    await delete_quietly('Attechments', [get_att_file.file_path])
+    signed_urls.forget(get_att_file.file_path)
+    event_bus.publish(user.user_id, ATTACHMENT, 'deleted', [pk], task_id=get_att_file.task_id)
+
     return {'detail': 'Attechment deleted successfully.'}
-    
@@ -3,56 +3,110 @@ from typing import Annotated
 from fastapi.routing import APIRouter
 from fastapi import Depends, Body, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.dependencies import get_db
-from ..core.security import hash_password, create_token, verify_password
+from ..core.security import (
+    HashingBusy, hash_password, create_token, verify_password, needs_rehash, hashing_metrics
+)
 from ..schemas.user import UserRegister, UserResponse
 from ..models.user import User
+from ..models.task import UserTaskStats
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 security = HTTPBasic()
 
 
-def get_user_by_username(user: str, database: Session) -> User:
-    return database.query(User).filter(User.username == user.username).first()
+def hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts, try again later.",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def get_user_by_username(user: str, database: AsyncSession) -> User:
+    return await database.scalar(select(User).where(User.username == user.username))
 
 
 @router.post("/register", response_model=UserResponse)
-def register(
-    user_data: Annotated[UserRegister, Body()], db: Annotated[Session, Depends(get_db)]
+async def register(
+    user_data: Annotated[UserRegister, Body()], db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    if get_user_by_username(user_data, db):
+    if await get_user_by_username(user_data, db):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="User exists."
         )
+    # hand the connection back to the pool while bcrypt runs, a hash can
+    # queue behind others for a while
+    await db.rollback()
 
-    new_user = User(
-        username=user_data.username, password=hash_password(user_data.password)
-    )
+    try:
+        password = await hash_password(user_data.password)
+    except HashingBusy:
+        raise hashing_busy()
+
+    new_user = User(username=user_data.username, password=password)
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.flush()
+        # zero counters up front, the admin stats listing reads user_task_stats alone
+        db.add(UserTaskStats(user_id=new_user.user_id))
+        await db.commit()
+    except IntegrityError:
+        # registered by a concurrent request while this one was hashing
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="User exists."
+        )
+    await db.refresh(new_user)
 
     return new_user
 
 
 @router.post("/login")
-def login(
+async def login(
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    user = get_user_by_username(credentials, db)
+    user = await get_user_by_username(credentials, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found."
         )
+    user_id, password_hash = user.user_id, user.password
+    # no connection is held while bcrypt runs
+    await db.rollback()
 
-    if not verify_password(credentials.password, user.password):
+    try:
+        verified = await verify_password(credentials.password, password_hash)
+    except HashingBusy:
+        raise hashing_busy()
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid username or password",
         )
 
-    return {"token": create_token(user.user_id)}
+    # bcrypt cost changed since this hash was made, upgrade it while
+    # the plain password is at hand (best effort, retried next login)
+    if needs_rehash(password_hash):
+        try:
+            new_hash = await hash_password(credentials.password)
+        except HashingBusy:
+            pass
+        else:
+            # a short transaction of its own, skipped if the password changed meanwhile
+            await db.execute(
+                update(User)
+                .where(User.user_id == user_id, User.password == password_hash)
+                .values(password=new_hash)
+            )
+            await db.commit()
+            hashing_metrics.rehashed += 1
+
+    return {"token": create_token(user_id)}
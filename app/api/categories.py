@@ -4,31 +4,35 @@ import shutil
 from uuid import uuid1
 
 
-from sqlalchemy.orm import Session
-from storage3.exceptions import StorageApiError
-from fastapi import HTTPException, status, Depends, File, UploadFile, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status, Depends, File, UploadFile, Form, Request, Response
 from fastapi.routing import APIRouter
-from supabase import create_client
 
 from ..core.dependencies import get_db
 from ..schemas.categories import CategoryResponse
-from ..models.user import User
-from ..models.task import Category
-from ..api.deps import get_admin, get_curent_user
+from ..models.task import Category, Task
+from ..api.deps import CurrentUser, get_admin, get_curent_user
 from ..core.config import settings
+from ..core.http_cache import etag_matches, not_modified
+from ..core.uploads import iter_upload
+from ..core.storage import StorageError, delete_quietly, get_storage
+from ..services.task_stats import record_category_delete
+from ..services.tombstones import TASK, bury_tasks
+from ..services.events import event_bus
+from ..services.category_registry import category_registry, icon_key, public_icon_url
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
-supabase = create_client(supabase_key=settings.supabase_key, supabase_url=settings.supabase_url)
 
 @router.post("/", response_model=CategoryResponse)
-def create_categories(
+async def create_categories(
     name: Annotated[str, Form()],
     color: Annotated[str, Form()],
     icon: Annotated[UploadFile, File()],
-    db: Annotated[Session, Depends(get_db)],
-    admin: Annotated[User, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    admin: Annotated[CurrentUser, Depends(get_admin)],
 ) -> CategoryResponse:
-    existing_category = db.query(Category).filter(Category.name == name).first()
+    existing_category = await db.scalar(select(Category).where(Category.name == name))
     if existing_category:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Category already exists."
@@ -59,14 +63,12 @@ def create_categories(
     # with open(icon_path, "wb") as buffer:
     #     shutil.copyfileobj(icon.file, buffer)
 
-    # Upload to Supabase Storage
+    # Upload to storage
     try:
-        res = supabase.storage.from_("media").upload(
-            icon_path,
-            icon.file.read(),
-            {"content-type": icon.content_type}
+        await get_storage().upload(
+            "media", icon_path, iter_upload(icon, settings.icon_max_size), icon.content_type
         )
-    except StorageApiError as e:
+    except StorageError as e:
         raise HTTPException(
             status_code=400,
             detail=str(e)
@@ -74,67 +76,70 @@ def create_categories(
 
     new_category = Category(name=name, color=color, icon=icon_path)
     db.add(new_category)
-    db.commit()
-    db.refresh(new_category)
+    try:
+        await db.commit()
+    except Exception:
+        # e.g. the same name created concurrently, drop the orphaned icon
+        await db.rollback()
+        await get_storage().delete("media", [icon_path])
+        raise
+    await db.refresh(new_category)
+    category_registry.invalidate()
 
     return CategoryResponse(
         category_id=new_category.category_id,
         name=new_category.name,
         color=new_category.color,
-        icon=f"https://ffqzvugwuogmwjtmyquj.supabase.co/storage/v1/object/public/media/{icon_path}"
+        icon=public_icon_url(icon_path)
     )
 
 
 @router.get("/", response_model=List[CategoryResponse])
-def get_category_list(
-    db: Annotated[Session, Depends(get_db)],
-    user: Annotated[User, Depends(get_curent_user)],
+async def get_category_list(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Annotated[CurrentUser, Depends(get_curent_user)],
 ) -> List[CategoryResponse]:
-    categories = db.query(Category).all()
-    result = []
-    
-    for category in categories:
-        signed_url = supabase.storage.from_("media").get_public_url(category.icon)
-        result.append(CategoryResponse(
-            category_id=category.category_id,
-            name=category.name,
-            color=category.color,
-            icon=signed_url
-        ))
-    return result
+    registry = await category_registry.ensure(db)
+
+    if etag_matches(request, registry.etag):
+        return not_modified(registry.etag)
+
+    return Response(
+        content=registry.payload, media_type="application/json", headers={"ETag": registry.etag}
+    )
 
 
 @router.get("/{pk}", status_code=status.HTTP_200_OK, response_model=CategoryResponse)
-def get_one_category(
+async def get_one_category(
     pk: int,
-    user: Annotated[User, Depends(get_curent_user)],
-    db: Annotated[Session, Depends(get_db)],
+    request: Request,
+    user: Annotated[CurrentUser, Depends(get_curent_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> CategoryResponse:
-    category = db.query(Category).get(pk)
-    if not category:
+    registry = await category_registry.ensure(db)
+    if pk not in registry.items:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Category not found."
         )
-    signed_url = supabase.storage.from_("media").get_public_url(category.icon)
-    
-    return CategoryResponse(
-        category_id=category.category_id,
-        name=category.name,
-        color=category.color,
-        icon=signed_url
-    )
+
+    body, etag = registry.items[pk]
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.put("/{pk}", status_code=status.HTTP_200_OK, response_model=CategoryResponse)
-def update_category(
+async def update_category(
     pk: int,
-    admin: Annotated[User, Depends(get_admin)],
-    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     name: Annotated[str | None, Form()] = None,
     color: Annotated[str, Form()] = None,
     icon: Annotated[UploadFile | None, File()] = None,
 ) -> CategoryResponse:
-    category = db.query(Category).get(pk)
+    category = await db.get(Category, pk)
 
     if name is None and color is None and icon is None:
         raise HTTPException(
@@ -184,55 +189,63 @@ def update_category(
         # with open(icon_path, "wb") as buffer:
         #     shutil.copyfileobj(icon.file, buffer)
 
-        # Upload to Supabase Storage
+        # Upload to storage
         try:
-            res = supabase.storage.from_("media").upload(
-                icon_path,
-                icon.file.read(),
-                {"content-type": icon.content_type}
+            await get_storage().upload(
+                "media", icon_path, iter_upload(icon, settings.icon_max_size), icon.content_type
             )
-        except StorageApiError as e:
+        except StorageError as e:
             raise HTTPException(
                 status_code=400,
                 detail=str(e)
             )
         
-        # Delete old icon file from local storage
-        # os.remove(category.icon)
-        
-        supabase.storage.from_("media").remove([category.icon.split('/')[-1]])
-
+        old_icon = category.icon
         category.icon = icon_path
 
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
+    category_registry.invalidate()
+
+    if update_icon:
+        # Delete old icon file from local storage
+        # os.remove(old_icon)
+
+        await delete_quietly("media", [icon_key(old_icon)])
     return CategoryResponse(
         category_id=category.category_id,
         name=category.name,
         color=category.color,
-        icon=f"https://ffqzvugwuogmwjtmyquj.supabase.co/storage/v1/object/public/media/{category.icon}"
+        icon=public_icon_url(category.icon)
     )
 
 
 @router.delete("/{pk}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(
+async def delete_category(
     pk: int,
-    admin: Annotated[User, Depends(get_admin)],
-    db: Annotated[Session, Depends(get_db)],
+    admin: Annotated[CurrentUser, Depends(get_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    category = db.query(Category).get(pk)
+    category = await db.get(Category, pk)
 
     if not category:
-        return HTTPException(
+        raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Category not found."
         )
-    
+    icon = icon_key(category.icon)
+
+    await record_category_delete(db, category.category_id)
+    buried = await bury_tasks(db, Task.category_id == category.category_id)
+    await db.delete(category)
+    await db.commit()
+    category_registry.invalidate()
+
     # Delete icon file from local storage
     # os.remove(category.icon)
-    
-    # Delete icon file from Supabase Storage
-    supabase.storage.from_("media").remove([category.icon.split('https://ffqzvugwuogmwjtmyquj.supabase.co/storage/v1/object/public/media/')[-1]])
-    
-    db.delete(category)
-    db.commit()
+
+    # Delete icon file from storage
+    await delete_quietly("media", [icon])
+    # the tasks went with the category through ON DELETE CASCADE, tell their owners
+    for user_id, task_ids in buried.items():
+        event_bus.publish(user_id, TASK, "deleted", task_ids)
     return {"detail": "Category deleted successfully."}
@@ -1,38 +1,124 @@
+from dataclasses import dataclass
+from time import time
 from typing import Annotated
-from sqlalchemy.orm import Session
+from cachetools import TLRUCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from ..core.config import settings
 from ..core.security import verify_token
-from ..models.user import User
+from ..models.user import User, Role
+from ..core.database import AsyncSessionLocal
 from ..core.dependencies import get_db
 
 
 security = HTTPBearer()
 
 
-def get_curent_user(
-    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
-    db: Annotated[Session, Depends(get_db)],
-) -> User:
-    decode_token = verify_token(credentials.credentials)
+@dataclass(frozen=True)
+class CurrentUser:
+    user_id: int
+    role: Role
+    expires: float
+
+    @property
+    def is_user(self) -> bool:
+        return self.role == Role.USER
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == Role.ADMIN
+
+
+# token -> CurrentUser, an entry never outlives the token's own "expires" claim
+token_cache = TLRUCache(
+    maxsize=settings.auth_cache_size,
+    ttu=lambda token, user, now: min(now + settings.auth_cache_ttl, user.expires),
+    timer=time,
+)
+
+
+# user_id -> tokens cached for that user, so a role edit does not scan the cache;
+# entries the cache already evicted are dropped when the user's set is next touched
+tokens_by_user: dict[int, set[str]] = {}
+
+
+def remember_token(token: str, user: CurrentUser) -> None:
+    token_cache[token] = user
+    tokens = {cached for cached in tokens_by_user.get(user.user_id, ()) if cached in token_cache}
+    tokens.add(token)
+    tokens_by_user[user.user_id] = tokens
+
+    # users whose tokens all expired, swept rarely enough to stay amortized O(1)
+    if len(tokens_by_user) > 2 * settings.auth_cache_size:
+        for user_id, tokens in list(tokens_by_user.items()):
+            if not any(cached in token_cache for cached in tokens):
+                del tokens_by_user[user_id]
+
+
+def invalidate_user(user_id: int) -> None:
+    # this worker only: the others pick the change up within auth_cache_ttl
+    for token in tokens_by_user.pop(user_id, ()):
+        token_cache.pop(token, None)
+
+
+async def user_from_token(token: str, db: AsyncSession) -> CurrentUser:
+    user = token_cache.get(token)
+    if user:
+        return user
+
+    decode_token = verify_token(token)
 
     if not decode_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token."
         )
 
-    user: User = db.query(User).get(decode_token["user_id"])
+    role = await db.scalar(
+        select(User.role).where(User.user_id == decode_token["user_id"])
+    )
 
-    if not user:
+    if not role:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token."
         )
 
+    user = CurrentUser(
+        user_id=decode_token["user_id"], role=role, expires=decode_token["expires"]
+    )
+    remember_token(token, user)
+
+    return user
+
+
+async def get_curent_user(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> CurrentUser:
+    return await user_from_token(credentials.credentials, db)
+
+
+async def event_user(token: str | None) -> CurrentUser:
+    # for long lived connections (websocket, SSE): a short session on a cache
+    # miss instead of get_db, which would hold a pooled connection until close
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token."
+        )
+
+    async with AsyncSessionLocal() as db:
+        user = await user_from_token(token, db)
+
+    if not user.is_user:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Permission dendied."
+        )
     return user
 
 
-def get_user(user: Annotated[User, Depends(get_curent_user)]) -> User:
+async def get_user(user: Annotated[CurrentUser, Depends(get_curent_user)]) -> CurrentUser:
     if not user.is_user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Permission dendied."
@@ -41,7 +127,7 @@ def get_user(user: Annotated[User, Depends(get_curent_user)]) -> User:
     return user
 
 
-def get_admin(admin: Annotated[User, Depends(get_curent_user)]) -> User:
+async def get_admin(admin: Annotated[CurrentUser, Depends(get_curent_user)]) -> CurrentUser:
     if not admin.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Permission dendied."
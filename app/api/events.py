@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from contextlib import suppress
+from time import time
+from typing import Annotated, Optional
+
+from fastapi import Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRouter
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from .deps import CurrentUser, event_user
+from ..core.config import settings
+from ..services.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=['Events'])
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+async def get_event_user(
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(optional_bearer)],
+    token: Annotated[Optional[str], Query()] = None
+) -> CurrentUser:
+    # EventSource cannot send headers, the token may come in the query string
+    return await event_user(credentials.credentials if credentials else token)
+
+
+@router.websocket('/ws')
+async def events_socket(
+    websocket: WebSocket,
+    token: Annotated[Optional[str], Query()] = None
+):
+    try:
+        user = await event_user(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+
+    with event_bus.subscribe(user.user_id) as subscription:
+        async def send_events():
+            while True:
+                await websocket.send_text(await subscription.get())
+
+        async def wait_closed():
+            # clients only listen, anything they send is ignored
+            while (await websocket.receive())['type'] != 'websocket.disconnect':
+                pass
+
+        # an idle connection is two parked tasks and an empty queue, no db session
+        sender = asyncio.create_task(send_events())
+        receiver = asyncio.create_task(wait_closed())
+        done = set()
+        try:
+            done, _ = await asyncio.wait(
+                (sender, receiver), timeout=max(user.expires - time(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            # collects every outcome, a failed task is never left unretrieved
+            results = await asyncio.gather(sender, receiver, return_exceptions=True)
+
+    if receiver in done and results[1] is None:
+        # the client went away
+        return
+
+    if done:
+        error = next(result for result in results if isinstance(result, Exception))
+        if isinstance(error, WebSocketDisconnect):
+            return
+        logger.error('event socket for user %s failed', user.user_id, exc_info=error)
+        code = status.WS_1011_INTERNAL_ERROR
+    else:
+        # the token ran out, the client reconnects with a fresh one
+        code = status.WS_1008_POLICY_VIOLATION
+
+    with suppress(RuntimeError, WebSocketDisconnect):
+        await websocket.close(code=code)
+
+
+@router.get('/events')
+async def events_stream(
+    user: Annotated[CurrentUser, Depends(get_event_user)]
+) -> StreamingResponse:
+    async def body():
+        with event_bus.subscribe(user.user_id) as subscription:
+            while time() < user.expires:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), settings.event_heartbeat)
+                except asyncio.TimeoutError:
+                    # keeps proxies from closing an idle stream
+                    yield b': ping\n\n'
+                    continue
+                yield f'data: {message}\n\n'.encode()
+
+    return StreamingResponse(
+        body(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,49 @@
+from typing import Annotated
+
+from fastapi.routing import APIRouter
+from fastapi import HTTPException, Query, status
+from fastapi.responses import FileResponse
+
+from ..core.storage import LocalStorage, StorageError, get_storage
+
+router = APIRouter(prefix='/files', tags=['Files'])
+
+
+def local_file(bucket: str, path: str) -> FileResponse:
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='File not found.')
+
+    try:
+        full_path = storage.resolve(bucket, path)
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='File not found.')
+
+    if not full_path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='File not found.')
+
+    # FileResponse answers Range requests and hands the file to the server
+    # through the pathsend extension (sendfile) where the server supports it
+    return FileResponse(full_path)
+
+
+@router.get('/public/{bucket}/{path:path}')
+async def public_file(bucket: str, path: str) -> FileResponse:
+    if bucket not in LocalStorage.public_buckets:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='File not found.')
+
+    return local_file(bucket, path)
+
+
+@router.get('/signed/{bucket}/{path:path}')
+async def signed_file(
+    bucket: str,
+    path: str,
+    expires: Annotated[int, Query()],
+    signature: Annotated[str, Query()],
+) -> FileResponse:
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage) or not storage.verify(bucket, path, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Invalid or expired link.')
+
+    return local_file(bucket, path)
@@ -7,6 +7,10 @@ from .categories import router as category_router
 from .subTask import router as subtask_router
 from .attechment import router as attechment_router
 from .adminPanel import router as admin_router
+from .adminMetrics import router as admin_metrics_router
+from .files import router as files_router
+from .sync import router as sync_router
+from .events import router as events_router
 
 router = APIRouter()
 
@@ -17,3 +21,7 @@ router.include_router(category_router)
 router.include_router(subtask_router)
 router.include_router(attechment_router)
 router.include_router(admin_router)
+router.include_router(admin_metrics_router)
+router.include_router(files_router)
+router.include_router(sync_router)
+router.include_router(events_router)
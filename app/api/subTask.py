@@ -1,152 +1,101 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi.routing import APIRouter
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import Depends, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .deps import get_curent_user, get_user
+from .deps import CurrentUser, get_curent_user, get_user
 from ..core.dependencies import get_db
-from ..models.task import SubTask, Task
-from ..models.user import User
+from ..core.http_cache import collection_etag, etag_matches, not_modified
+from ..core.pagination import PageParams, page_params, keyset, page_of
+from ..core.responses import columns_for, rows_response
+from ..core.streaming import stream_format, stream_rows
+from ..models.task import SubTask
 from ..schemas.subtask import SubTaskCreate, SubTaskResponse, SubTaskUpdate
+from ..schemas.pagination import Page
+from ..services.repository import sub_tasks
+from ..services.tombstones import SUBTASK, bury
+from ..services.events import event_bus
 
 
 router = APIRouter(prefix='/subtask', tags=['SubTask'])
 
+SUBTASK_ORDER = (SubTask.sub_task_id,)
+SUBTASK_COLUMNS = columns_for(SubTask, SubTaskResponse)
+
 
 @router.post('/', response_model=SubTaskResponse)
-def create_subtask(
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
+async def create_subtask(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     data: SubTaskCreate
 ) -> SubTaskResponse:
-    task = db.query(Task).filter(Task.task_id==data.task_id).first()
-    
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found."
-        )
-        
-    
-    if task.user_id != user.user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail='Not allowed.'
-        )
-    
-    
-    new_subtask = SubTask(
-        user_id=user.user_id,
+    new_subtask = await sub_tasks.insert_for_task(
+        db, data.task_id, user.user_id,
         name=data.name,
-        description=data.description,
-        task_id=data.task_id
+        description=data.description
     )
-    
-    db.add(new_subtask)
-    db.commit()
-    db.refresh(new_subtask)
-    
+    await db.commit()
+    event_bus.publish(user.user_id, SUBTASK, 'created', [new_subtask.sub_task_id], task_id=new_subtask.task_id)
+
     return new_subtask
 
 
-@router.get('/user_subtasks', response_model=list[SubTaskResponse])
-def get_user_sub_tasks(
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)]
+@router.get('/user_subtasks', response_model=Page[SubTaskResponse])
+async def get_user_sub_tasks(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    stream: Annotated[Optional[str], Depends(stream_format)],
+    request: Request
 ):
-    sub_tasks = db.query(SubTask).filter(SubTask.user_id==user.user_id).all()
-    return sub_tasks
+    etag, cache_headers = await collection_etag(request, db, user.user_id, (SubTask,), stream)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_headers)
+
+    query = select(*SUBTASK_COLUMNS).where(SubTask.user_id==user.user_id)
+    if stream:
+        response = stream_rows(db, query.order_by(*SUBTASK_ORDER), stream)
+    else:
+        rows = await db.execute(keyset(query, SUBTASK_ORDER, page))
+        response = rows_response(page_of(rows, SUBTASK_ORDER, page))
+
+    response.headers.update(cache_headers)
+    return response
 
 
 @router.put('/{pk}', response_model=SubTaskResponse)
-def update_subtask(
+async def update_subtask(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     data: SubTaskUpdate
 ) -> SubTaskResponse:
-    sub_task = db.query(SubTask).filter(SubTask.sub_task_id==pk).first()
-    
-    if not sub_task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Sub Task not found.'
-        )
-    
-    task = sub_task.task
-    
-    
-    if task.user_id != user.user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail='Not allowed.'
-        )
-    
-    
-    if data.name is not None:
-        sub_task.name = data.name
-
-    if data.description is not None:
-        sub_task.description = data.description
-    
-    db.commit()
-    db.refresh(sub_task)
-    
+    sub_task = await sub_tasks.update(db, pk, user.user_id, data.model_dump(exclude_none=True))
+    await db.commit()
+    event_bus.publish(user.user_id, SUBTASK, 'updated', [pk], task_id=sub_task.task_id)
+
     return sub_task
-    
+
 
 @router.get('/{pk}', response_model=SubTaskResponse)
-def get_one_sub_task(
+async def get_one_sub_task(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)]
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    sub_task = db.query(SubTask).filter(SubTask.sub_task_id==pk).first()
-    
-    if not sub_task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Sub Task not found.'
-        )
-    
-    task = sub_task.task
-
-    if task.user_id != user.user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail='Not allowed.'
-        )
-
-        
-        
-    return sub_task
+    return await sub_tasks.get(db, pk, user.user_id, *SUBTASK_COLUMNS)
+
 
- 
 @router.delete('/{pk}', response_model=dict)
-def delete_sup_task(
+async def delete_sup_task(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)]   
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    subtask = db.query(SubTask).filter(SubTask.sub_task_id==pk).first()
-    
-    if not subtask:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Sub Task not found.'
-        )
-    
-    task = subtask.task
-    
-    
-    if task.user_id != user.user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail='Not allowed.'
-        )
-    
-    db.delete(subtask)
-    db.commit()
+    sub_task = await sub_tasks.delete(db, pk, user.user_id)
+    await bury(db, SUBTASK, pk, user.user_id)
+    await db.commit()
+    event_bus.publish(user.user_id, SUBTASK, 'deleted', [pk], task_id=sub_task.task_id)
     return {'detail': 'Sub Task deleted successfully.'}
-    
\ No newline at end of file
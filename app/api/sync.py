@@ -0,0 +1,128 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Annotated, Optional
+
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRouter
+from sqlalchemy import literal, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .deps import CurrentUser, get_user
+from ..core.config import settings
+from ..core.dependencies import get_db
+from ..core.pagination import decode_cursor, encode_cursor
+from ..core.responses import columns_for
+from ..models.task import Attechment, SubTask, Task, Tombstone
+from ..schemas.sync import SyncChanges
+from ..schemas.task import TaskResponse
+from ..services.task_expand import ATTECHMENT_COLUMNS, SUBTASK_COLUMNS
+from ..services.signed_urls import attechment_urls
+from ..services.tombstones import ATTACHMENT, SUBTASK, TASK
+
+router = APIRouter(prefix='/sync', tags=['Sync'])
+
+DELETED = 'deleted'
+TASK_COLUMNS = columns_for(Task, TaskResponse)
+
+# kind -> (table, id, change time); every one is read through its (user_id, time) index
+SOURCES = {
+    TASK: (Task, Task.task_id, Task.update_at),
+    SUBTASK: (SubTask, SubTask.sub_task_id, SubTask.update_at),
+    ATTACHMENT: (Attechment, Attechment.attechment_id, Attechment.update_at),
+    DELETED: (Tombstone, Tombstone.tombstone_id, Tombstone.deleted_at),
+}
+
+# a cursor is (change time, kind, id) of the last change the client has
+CURSOR_COLUMNS = (Task.update_at, Tombstone.entity, Task.task_id)
+
+
+def changes_of(kind: str, user_id: int, after: Optional[list], until: datetime, limit: int):
+    model, id_column, changed_at = SOURCES[kind]
+
+    query = select(
+        literal(kind).label('kind'), id_column.label('id'), changed_at.label('changed_at')
+    ).where(model.user_id == user_id, changed_at <= until)
+
+    if after:
+        at, after_kind, after_id = after
+        # the plain >= keeps the index range scan, the row compare breaks ties
+        query = query.where(
+            changed_at >= at,
+            tuple_(changed_at, literal(kind), id_column)
+            > tuple_(literal(at), literal(after_kind), literal(after_id)),
+        )
+
+    return query.order_by(changed_at, id_column).limit(limit + 1)
+
+
+@router.get('/changes', response_model=SyncChanges)
+async def changes(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    since: Annotated[Optional[str], Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=settings.sync_max_changes)] = settings.sync_max_changes
+):
+    now = datetime.now()
+    after = decode_cursor(since, CURSOR_COLUMNS) if since else None
+
+    if after and after[0] < now - timedelta(days=settings.tombstone_retention_days):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail='Cursor is older than the deletion history, sync from scratch.'
+        )
+
+    # rows written in the last few seconds wait for the next poll, so a
+    # transaction that commits a little after its update_at is not skipped
+    until = now - timedelta(seconds=settings.sync_settle_seconds)
+
+    merged = union_all(
+        *(changes_of(kind, user.user_id, after, until, limit) for kind in SOURCES)
+    ).subquery('changes')
+    found = (
+        await db.execute(
+            select(merged)
+            .order_by(merged.c.changed_at, merged.c.kind, merged.c.id)
+            .limit(limit + 1)
+        )
+    ).all()
+
+    has_more = len(found) > limit
+    found = found[:limit]
+
+    ids = defaultdict(list)
+    for change in found:
+        ids[change.kind].append(change.id)
+
+    result = {'tasks': [], 'subtasks': [], 'attachments': [], 'deleted': []}
+
+    # one IN query per kind that actually changed
+    if ids[TASK]:
+        rows = await db.execute(select(*TASK_COLUMNS).where(Task.task_id.in_(ids[TASK])))
+        result['tasks'] = [row._asdict() for row in rows]
+    if ids[SUBTASK]:
+        rows = await db.execute(select(*SUBTASK_COLUMNS).where(SubTask.sub_task_id.in_(ids[SUBTASK])))
+        result['subtasks'] = [row._asdict() for row in rows]
+    if ids[ATTACHMENT]:
+        rows = (
+            await db.execute(select(*ATTECHMENT_COLUMNS).where(Attechment.attechment_id.in_(ids[ATTACHMENT])))
+        ).all()
+        urls = await attechment_urls.get_many(row.file_path for row in rows)
+        result['attachments'] = [
+            {**row._asdict(), 'file_path': urls.get(row.file_path, '')} for row in rows
+        ]
+    if ids[DELETED]:
+        rows = await db.execute(
+            select(Tombstone.entity, Tombstone.entity_id, Tombstone.deleted_at)
+            .where(Tombstone.tombstone_id.in_(ids[DELETED]))
+        )
+        result['deleted'] = [row._asdict() for row in rows]
+
+    if has_more:
+        last = found[-1]
+        next_cursor = encode_cursor([last.changed_at, last.kind, last.id])
+    else:
+        # everything up to `until` has been handed out
+        next_cursor = encode_cursor([until, '', 0])
+
+    return ORJSONResponse({**result, 'next_cursor': next_cursor, 'has_more': has_more})
@@ -1,169 +1,447 @@
 from datetime import datetime
-from typing import Annotated, List, Optional
-from fastapi import Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-
-from .deps import get_curent_user, get_user
+from typing import Annotated, List, Literal, Optional
+from asyncpg import PostgresError
+from fastapi import Depends, File, HTTPException, status, Query, Request, UploadFile
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Float, delete, func, insert, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .deps import CurrentUser, get_curent_user, get_user
 from ..core.dependencies import get_db
-from ..models.task import Category, Priority, Task, TaskStatus
-from ..models.user import User
-from ..schemas.task import TaskCreate, TaskResponse, TaskUpdate
+from ..core.http_cache import collection_etag, etag_matches, not_modified
+from ..core.pagination import PageParams, page_params, keyset, page_of
+from ..core.responses import columns_for, rows_response
+from ..core.config import settings
+from ..core.streaming import CSV, NDJSON, stream_format, stream_rows
+from ..core.uploads import iter_upload
+from ..models.task import SEARCH_CONFIG, Priority, SubTask, Task, TaskStatus
+from ..schemas.task import (
+    TaskCreate, TaskDetailResponse, TaskResponse, TaskSearchResponse, TaskUpdate,
+    TaskBulkCreate, TaskBulkUpdate, TaskBulkDelete, TaskBulkItem, TaskBulkResult, TaskImportResult,
+)
+from ..schemas.pagination import Page
+from ..services.task_stats import record_task_change, record_task_changes
+from ..services.category_registry import category_registry
+from ..services.repository import tasks
+from ..services.tombstones import TASK, bury_tasks
+from ..services.events import event_bus
+from ..services.task_import import TaskImportError, import_tasks
+from ..services.task_expand import expand_params, expand_tasks, expand_version, expanded_models
 
 
 from fastapi.routing import APIRouter
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
+TASK_ORDER = (Task.due_date, Task.task_id)
+TASK_COLUMNS = columns_for(Task, TaskResponse)
+
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def task_write_error(e: IntegrityError) -> HTTPException:
+    sqlstate = getattr(e.orig, "sqlstate", None) or getattr(e.orig, "pgcode", None)
+    if sqlstate == UNIQUE_VIOLATION:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Task with this name already exists.",
+        )
+    if sqlstate == FOREIGN_KEY_VIOLATION:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Category not found."
+        )
+    raise e
+
 
 @router.post("/")
-def create_task(
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
+async def create_task(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     task_data: TaskCreate,
 ) -> TaskResponse:
-    exists_task = (
-        db.query(Task)
-        .filter(Task.name == task_data.name, Task.user_id == user.user_id)
-        .first()
-    )
+    # duplicate names and unknown categories are caught by uq_tasks_user_id_name
+    # and the category foreign key, no checking SELECT before the write
+    try:
+        new_task = await db.scalar(
+            insert(Task)
+            .values(
+                name=task_data.name,
+                description=task_data.description,
+                due_date=task_data.due_date,
+                priority=task_data.priority or Priority.PRIORITY05,
+                status=TaskStatus.TODO,
+                category_id=task_data.category_id,
+                user_id=user.user_id,
+            )
+            .returning(Task)
+        )
+        await record_task_change(db, user.user_id, new_status=TaskStatus.TODO)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise task_write_error(e)
+
+    event_bus.publish(user.user_id, TASK, "created", [new_task.task_id])
+    return new_task
 
-    if exists_task:
+
+@router.post("/bulk", response_model=TaskBulkResult)
+async def bulk_create_tasks(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    data: TaskBulkCreate,
+) -> TaskBulkResult:
+    names = {task_data.name for task_data in data.tasks}
+    taken = set(
+        await db.scalars(
+            select(Task.name).where(Task.user_id == user.user_id, Task.name.in_(names))
+        )
+    )
+    categories = await category_registry.existing(db, {task_data.category_id for task_data in data.tasks})
+
+    items = []
+    rows = []
+    for index, task_data in enumerate(data.tasks):
+        if task_data.name in taken:
+            items.append(TaskBulkItem(index=index, ok=False, detail="Task with this name already exists."))
+        elif task_data.category_id not in categories:
+            items.append(TaskBulkItem(index=index, ok=False, detail="Category not found."))
+        else:
+            taken.add(task_data.name)
+            items.append(TaskBulkItem(index=index, ok=True))
+            rows.append(dict(
+                name=task_data.name,
+                description=task_data.description,
+                due_date=task_data.due_date,
+                priority=task_data.priority or Priority.PRIORITY05,
+                status=TaskStatus.TODO,
+                category_id=task_data.category_id,
+                user_id=user.user_id,
+            ))
+
+    if rows:
+        # one multi-row INSERT ... RETURNING, rows come back in parameter order;
+        # a name taken by a concurrent request fails the batch on the constraint
+        try:
+            created = iter(
+                await db.scalars(
+                    insert(Task).returning(Task, sort_by_parameter_order=True), rows
+                )
+            )
+        except IntegrityError as e:
+            await db.rollback()
+            raise task_write_error(e)
+        for item in items:
+            if item.ok:
+                task = next(created)
+                item.task_id = task.task_id
+                item.task = TaskResponse.model_validate(task)
+
+        await record_task_changes(db, user.user_id, [(None, TaskStatus.TODO)] * len(rows))
+        await db.commit()
+        event_bus.publish(user.user_id, TASK, "created", [item.task_id for item in items if item.ok])
+
+    return TaskBulkResult(succeeded=len(rows), failed=len(items) - len(rows), items=items)
+
+
+@router.patch("/bulk", response_model=TaskBulkResult)
+async def bulk_update_tasks(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    data: TaskBulkUpdate,
+) -> TaskBulkResult:
+    values = data.model_dump(exclude={"task_ids"}, exclude_none=True)
+    if not values:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Task with this name already exists.",
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No data provided for update."
         )
 
-    category = (
-        db.query(Category).filter(Category.category_id == task_data.category_id).first()
-    )
-    if not category:
+    if data.category_id and not await category_registry.exists(db, data.category_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Category not found."
         )
 
-    new_task = Task(
-        name=task_data.name,
-        description=task_data.description,
-        due_date=task_data.due_date,
-        priority=task_data.priority or Priority.PRIORITY05,
-        category_id=task_data.category_id,
-        user_id=user.user_id,
+    # same UPDATE ... FROM the locked rows as update_task: the previous statuses
+    # come back with the new rows, so a concurrent write can't skew the counters;
+    # rows are locked in id order, two overlapping bulk updates can't deadlock
+    old = (
+        select(Task.task_id, Task.status)
+        .where(Task.user_id == user.user_id, Task.task_id.in_(data.task_ids))
+        .order_by(Task.task_id)
+        .with_for_update()
+        .subquery("old")
     )
+    try:
+        rows = (
+            await db.execute(
+                update(Task)
+                .where(Task.task_id == old.c.task_id)
+                .values(**values)
+                .returning(Task, old.c.status)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
 
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
-
-    return new_task
+        updated = {task.task_id: task for task, _ in rows}
+        if rows:
+            await record_task_changes(
+                db, user.user_id, [(old_status, task.status) for task, old_status in rows]
+            )
+            await db.commit()
+    except IntegrityError as e:
+        # the category went away after the registry check
+        await db.rollback()
+        raise task_write_error(e)
+
+    if updated:
+        event_bus.publish(user.user_id, TASK, "updated", list(updated))
+
+    return bulk_result(data.task_ids, updated)
+
+
+@router.delete("/bulk", response_model=TaskBulkResult)
+async def bulk_delete_tasks(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    data: TaskBulkDelete,
+) -> TaskBulkResult:
+    await bury_tasks(db, Task.user_id == user.user_id, Task.task_id.in_(data.task_ids))
+    deleted = dict(
+        (
+            await db.execute(
+                delete(Task)
+                .where(Task.user_id == user.user_id, Task.task_id.in_(data.task_ids))
+                .returning(Task.task_id, Task.status)
+            )
+        ).all()
+    )
 
+    if deleted:
+        await record_task_changes(
+            db, user.user_id, [(old_status, None) for old_status in deleted.values()]
+        )
+        await db.commit()
+        event_bus.publish(user.user_id, TASK, "deleted", list(deleted))
 
-@router.get("/")
-def get_task_list(
-    user: Annotated[User, Depends(get_user)], db: Annotated[Session, Depends(get_db)]
-):
-    tasks = db.query(Task).filter(Task.user_id == user.user_id).all()
-    return tasks
+    return bulk_result(data.task_ids, {task_id: None for task_id in deleted})
 
 
-@router.get("/filter", response_model=List[TaskResponse])
-def filter_tasks(
-    user: Annotated[User, Depends(get_curent_user)],
-    db: Annotated[Session, Depends(get_db)],
+def bulk_result(task_ids: List[int], done: dict) -> TaskBulkResult:
+    items = [
+        TaskBulkItem(
+            index=index,
+            task_id=task_id,
+            ok=task_id in done,
+            detail=None if task_id in done else "Task not found.",
+            task=TaskResponse.model_validate(done[task_id]) if done.get(task_id) else None,
+        )
+        for index, task_id in enumerate(task_ids)
+    ]
+    succeeded = sum(item.ok for item in items)
+    return TaskBulkResult(succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+
+@router.get("/", response_model=Page[TaskDetailResponse])
+async def get_task_list(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    expand: Annotated[frozenset[str], Depends(expand_params)],
+    stream: Annotated[Optional[str], Depends(stream_format)],
+    request: Request,
+):
+    # polling clients get a 304 before any task row is read
+    etag, cache_headers = await collection_etag(
+        request, db, user.user_id, expanded_models(Task, expand), stream, await expand_version(db, expand)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_headers)
+
+    query = select(*TASK_COLUMNS).where(Task.user_id == user.user_id)
+    if stream:
+        # the stream carries the plain task rows, expand stays a paged feature
+        response = stream_rows(db, query.order_by(*TASK_ORDER), stream)
+    else:
+        result = page_of(await db.execute(keyset(query, TASK_ORDER, page)), TASK_ORDER, page)
+        result["items"] = await expand_tasks(db, user.user_id, result["items"], expand)
+        response = rows_response(result)
+
+    response.headers.update(cache_headers)
+    return response
+
+
+@router.get("/filter", response_model=Page[TaskDetailResponse])
+async def filter_tasks(
+    user: Annotated[CurrentUser, Depends(get_curent_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    expand: Annotated[frozenset[str], Depends(expand_params)],
     status: Annotated[Optional[TaskStatus], Query()] = None,
     priority: Annotated[Optional[Priority], Query()] = None,
     due_date: Annotated[Optional[datetime], Query()] = None,
 ):
-    query = db.query(Task).filter(Task.user_id == user.user_id)
-
-    # print()
+    query = select(*TASK_COLUMNS).where(Task.user_id == user.user_id)
 
     if status is not None:
-        query = query.filter(Task.status == status)
+        query = query.where(Task.status == status)
     if priority is not None:
-        query = query.filter(Task.priority == priority)
+        query = query.where(Task.priority == priority)
     if due_date is not None:
-        query = query.filter(Task.due_date <= due_date)
+        query = query.where(Task.due_date <= due_date)
 
-    # print(status, priority.value, due_date)
+    result = page_of(await db.execute(keyset(query, TASK_ORDER, page)), TASK_ORDER, page)
+    result["items"] = await expand_tasks(db, user.user_id, result["items"], expand)
+    return rows_response(result)
 
-    tasks = query.all()
-    return tasks
 
+@router.get("/search", response_model=Page[TaskSearchResponse])
+async def search_tasks(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    expand: Annotated[frozenset[str], Depends(expand_params)],
+):
+    ts_query = func.websearch_to_tsquery(literal(SEARCH_CONFIG).cast(REGCONFIG), q)
+
+    # both sides hit their GIN index, a task ranks by its best match,
+    # either its own text or the text of one of its subtasks
+    matches = union_all(
+        select(Task.task_id.label("task_id"), func.ts_rank(Task.search_vector, ts_query, type_=Float).label("rank"))
+        .where(Task.user_id == user.user_id, Task.search_vector.op("@@")(ts_query)),
+        select(SubTask.task_id.label("task_id"), func.ts_rank(SubTask.search_vector, ts_query, type_=Float).label("rank"))
+        .where(SubTask.user_id == user.user_id, SubTask.search_vector.op("@@")(ts_query)),
+    ).subquery("matches")
+    ranked = (
+        select(matches.c.task_id, func.max(matches.c.rank).label("rank"))
+        .group_by(matches.c.task_id)
+        .subquery("ranked")
+    )
+    search_order = (ranked.c.rank, ranked.c.task_id)
+
+    rows = await db.execute(
+        keyset(
+            select(*TASK_COLUMNS, ranked.c.rank).join(ranked, ranked.c.task_id == Task.task_id),
+            search_order,
+            page,
+            descending=True,
+        )
+    )
+    result = page_of(rows, search_order, page)
+    result["items"] = await expand_tasks(db, user.user_id, result["items"], expand)
+    return rows_response(result)
 
-@router.get("/{pk}")
-def get_one_task(
-    pk: int,
-    db: Annotated[Session, Depends(get_db)],
-    user: Annotated[User, Depends(get_user)],
+
+@router.get("/export")
+async def export_tasks(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    format: Annotated[Literal["ndjson", "csv"], Query()] = "ndjson",
 ):
-    exists_task = (
-        db.query(Task).filter(Task.task_id == pk, Task.user_id == user.user_id).first()
+    # whole task set off a server side cursor, the same shape /tasks/import reads back
+    response = stream_rows(
+        db,
+        select(*TASK_COLUMNS).where(Task.user_id == user.user_id).order_by(Task.task_id),
+        CSV if format == "csv" else NDJSON,
     )
+    response.headers["Content-Disposition"] = f'attachment; filename="tasks.{format}"'
+    return response
 
-    if not exists_task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
-        )
 
-    return exists_task
+@router.post("/import", response_model=TaskImportResult)
+async def import_tasks_file(
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    file: Annotated[UploadFile, File()],
+) -> TaskImportResult:
+    csv_format = file.content_type == CSV or (file.filename or "").lower().endswith(".csv")
+
+    try:
+        result = await import_tasks(
+            db, user.user_id, iter_upload(file, settings.upload_max_size), csv_format
+        )
+        await db.commit()
+    except TaskImportError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PostgresError as e:
+        # COPY rejected a value, e.g. text in an integer column
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid import data: {e}")
+
+    # imported ids are never fetched, clients pull them through /sync/changes
+    if result["imported"]:
+        event_bus.publish(user.user_id, TASK, "imported", [], count=result["imported"])
+    return TaskImportResult(**result)
+
+
+@router.get("/{pk}", response_model=TaskDetailResponse)
+async def get_one_task(
+    pk: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Annotated[CurrentUser, Depends(get_user)],
+    expand: Annotated[frozenset[str], Depends(expand_params)],
+):
+    exists_task = await tasks.get(db, pk, user.user_id, *TASK_COLUMNS)
+    [task] = await expand_tasks(db, user.user_id, [exists_task], expand)
+    return ORJSONResponse(task)
 
 
 @router.put("/{pk}")
-def update_task(
+async def update_task(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     task_data: TaskUpdate,
 ) -> TaskResponse:
-    task = (
-        db.query(Task).filter(Task.task_id == pk, Task.user_id == user.user_id).first()
-    )
-
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
-        )
-
-    if task_data.name:
-        if db.query(Task).filter(Task.name == task_data.name, Task.user_id == user.user_id).first():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Task with this name already exists.",
-            )
-        task.name = task_data.name
-    task.description = (
-        task_data.description if task_data.description else task.description
+    values = {key: value for key, value in task_data.model_dump().items() if value}
+    if not values:
+        return await tasks.get(db, pk, user.user_id)
+
+    # UPDATE ... FROM the locked row hands back the previous status with the new
+    # row, so the counters are only touched when the status really changed
+    old = (
+        select(Task.task_id, Task.status)
+        .where(*tasks.owned(pk, user.user_id))
+        .with_for_update()
+        .subquery("old")
     )
-    task.due_date = task_data.due_date if task_data.due_date else task.due_date
-    task.priority = task_data.priority if task_data.priority else task.priority
-    task.status = task_data.status if task_data.status else task.status
-    if task_data.category_id:
-        if not db.query(Category).filter(Category.category_id == task_data.category_id).first():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Category not found."
+    try:
+        row = (
+            await db.execute(
+                update(Task)
+                .where(Task.task_id == old.c.task_id)
+                .values(**values)
+                .returning(Task, old.c.status)
+                .execution_options(synchronize_session=False)
             )
-        task.category_id = task_data.category_id
-
-    db.commit()
-    db.refresh(task)
+        ).first()
+        if not row:
+            raise tasks.missing()
+
+        task, old_status = row
+        await record_task_change(db, user.user_id, old_status, task.status)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise task_write_error(e)
+
+    event_bus.publish(user.user_id, TASK, "updated", [task.task_id])
     return task
 
 
 @router.delete("/{pk}")
-def delete_task(
+async def delete_task(
     pk: int,
-    user: Annotated[User, Depends(get_user)],
-    db: Annotated[Session, Depends(get_db)],
+    user: Annotated[CurrentUser, Depends(get_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    task = (
-        db.query(Task).filter(Task.task_id == pk, Task.user_id == user.user_id).first()
-    )
-
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
-        )
-
-    db.delete(task)
-    db.commit()
+    await bury_tasks(db, *tasks.owned(pk, user.user_id))
+    task = await tasks.delete(db, pk, user.user_id)
+    await record_task_change(db, user.user_id, old_status=task.status)
+    await db.commit()
+    event_bus.publish(user.user_id, TASK, "deleted", [pk])
     return {"message": "Task deleted successfully"}
@@ -1,32 +1,62 @@
-from typing import Annotated, List, Dict
-from sqlalchemy.orm import Session
+from typing import Annotated, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from fastapi.routing import APIRouter
 
 from ..models.user import User
-from ..models.task import TaskStatus
+from ..models.task import UserTaskStats
 from ..core.dependencies import get_db
+from ..core.pagination import PageParams, page_params, keyset, page_of
+from ..core.responses import columns_for
+from ..core.streaming import stream_format, stream_rows
 from ..schemas.user import UserResponse, UserProfile
-from ..api.deps import get_user, get_admin
+from ..schemas.pagination import Page
+from ..api.deps import CurrentUser, get_user
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+USER_ORDER = (User.user_id,)
 
-@router.get("/", response_model=List[UserResponse])
-def get_users(db: Annotated[Session, Depends(get_db)]):
-    return db.query(User).all()
+
+@router.get("/", response_model=Page[UserResponse])
+async def get_users(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends(page_params)],
+    stream: Annotated[Optional[str], Depends(stream_format)],
+):
+    if stream:
+        return stream_rows(db, select(*columns_for(User, UserResponse)).order_by(*USER_ORDER), stream)
+
+    users = await db.scalars(keyset(select(User), USER_ORDER, page))
+    return page_of(users, USER_ORDER, page)
 
 
 @router.get("/profile", response_model=UserProfile)
-def profile(
-    db: Annotated[Session, Depends(get_db)], user: Annotated[User, Depends(get_user)]
+async def profile(
+    db: Annotated[AsyncSession, Depends(get_db)], user: Annotated[CurrentUser, Depends(get_user)]
 ):
+    # counters are kept up to date by the task write paths
+    found = (
+        await db.execute(
+            select(User, UserTaskStats)
+            .outerjoin(UserTaskStats, UserTaskStats.user_id == User.user_id)
+            .where(User.user_id == user.user_id)
+        )
+    ).one_or_none()
+    # the token can outlive its user by up to the auth cache ttl
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found."
+        )
+    profile_user, stats = found
+
     result = {
-        "task_count": user.tasks.count(),
-        "task_todo": user.tasks.filter_by(status=TaskStatus.TODO).count(),
-        "task_doing": user.tasks.filter_by(status=TaskStatus.DOING).count(),
-        "task_done": user.tasks.filter_by(status=TaskStatus.DONE).count(),
+        "task_count": stats.total if stats else 0,
+        "task_todo": stats.todo if stats else 0,
+        "task_doing": stats.doing if stats else 0,
+        "task_done": stats.done if stats else 0,
     }
 
-    return {"user": user, "result": result}
+    return {"user": profile_user, "result": result}
@@ -0,0 +1,215 @@
+import asyncio
+from base64 import b64decode
+from collections import OrderedDict, deque
+
+from fastapi.responses import ORJSONResponse
+
+from .config import settings
+from .security import verify_token
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+# metrics must stay readable under load, event streams stay open for hours
+EXEMPT_PATHS = ("/api/admin/metrics", "/api/events", "/api/ws")
+AUTH_PATHS = ("/api/auth/",)
+# bcrypt, admin aggregates, storage signing and whole-collection streams
+HEAVY_PATHS = (
+    "/api/admin/",
+    "/api/tasks/search",
+    "/api/tasks/export",
+    "/api/tasks/import",
+    "/api/sync/",
+)
+# reads sign storage urls (heavy); multipart posts and chunk puts run at the
+# client's pace and get slots of their own, slow uploaders only wait for each other
+ATTACHMENT_PATHS = ("/api/attechment",)
+UPLOAD_METHODS = ("POST", "PUT")
+
+
+class RouteClass:
+    # a fixed number of slots; when they are all taken, requests wait in one
+    # bounded queue per user and freed slots go round robin over users, so a
+    # client firing many requests only ever waits behind itself
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._queues: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._pending: dict[str, int] = {}
+
+    async def acquire(self, client: str) -> None:
+        # the per-user share covers running requests too, not only queued ones
+        if self._pending.get(client, 0) >= settings.admission_per_user:
+            self.rejected += 1
+            raise AdmissionRejected()
+
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            self.admitted += 1
+            self._pending[client] = self._pending.get(client, 0) + 1
+            return
+
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._pending[client] = self._pending.get(client, 0) + 1
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), settings.admission_queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # the slot was handed over just as we gave up, pass it on
+                self.release(client)
+            else:
+                waiter.cancel()
+                self._forget(client, waiter)
+                self._drop(client)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise AdmissionRejected()
+            raise
+
+        self.admitted += 1
+
+    def release(self, client: str) -> None:
+        self._drop(client)
+
+        # the slot goes straight to the next user in line, active stays the same
+        if self._queues:
+            next_client, queue = self._queues.popitem(last=False)
+            queue.popleft().set_result(None)
+            self.waiting -= 1
+            if queue:
+                self._queues[next_client] = queue
+        else:
+            self.active -= 1
+
+    def _forget(self, client: str, waiter: asyncio.Future) -> None:
+        queue = self._queues[client]
+        queue.remove(waiter)
+        self.waiting -= 1
+        if not queue:
+            del self._queues[client]
+
+    def _drop(self, client: str) -> None:
+        self._pending[client] -= 1
+        if not self._pending[client]:
+            del self._pending[client]
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "waiting_users": len(self._queues),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+class Admission:
+    def __init__(self):
+        self.classes = {
+            "auth": RouteClass("auth", settings.admission_auth_limit, settings.admission_auth_queue),
+            "heavy": RouteClass("heavy", settings.admission_heavy_limit, settings.admission_heavy_queue),
+            "upload": RouteClass("upload", settings.admission_upload_limit, settings.admission_upload_queue),
+            "default": RouteClass("default", settings.admission_default_limit, settings.admission_default_queue),
+        }
+
+    def route_class(self, method: str, path: str) -> RouteClass | None:
+        if path.startswith(EXEMPT_PATHS) or not path.startswith("/api/"):
+            return None
+        if path.startswith(AUTH_PATHS):
+            return self.classes["auth"]
+        if path.startswith(ATTACHMENT_PATHS):
+            if method == "GET":
+                return self.classes["heavy"]
+            if method in UPLOAD_METHODS:
+                return self.classes["upload"]
+            return self.classes["default"]
+        if path.startswith(HEAVY_PATHS):
+            return self.classes["heavy"]
+        return self.classes["default"]
+
+    def snapshot(self) -> dict:
+        return {
+            "per_user": settings.admission_per_user,
+            "queue_timeout": settings.admission_queue_timeout,
+            "classes": {name: route_class.snapshot() for name, route_class in self.classes.items()},
+        }
+
+
+admission = Admission()
+
+
+def client_key(scope) -> str:
+    # fair share is per user when the token checks out (an HMAC, no db)
+    headers = dict(scope["headers"])
+    scheme, _, credentials = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        payload = verify_token(credentials)
+        if payload:
+            return f"user:{payload['user_id']}"
+    elif scheme.lower() == "basic" and credentials:
+        # login: every account gets its own share, which also caps guessing per account
+        try:
+            username = b64decode(credentials).decode().partition(":")[0]
+        except (ValueError, UnicodeDecodeError):
+            username = ""
+        if username:
+            return f"login:{username}"
+
+    # anonymous: per address; behind a proxy every request shares the proxy's address
+    # unless its X-Forwarded-For is trusted, where the last hop is the one it added
+    forwarded = headers.get(b"x-forwarded-for") if settings.admission_trust_forwarded else None
+    if forwarded:
+        return f"addr:{forwarded.decode('latin-1').split(',')[-1].strip()}"
+
+    client = scope.get("client")
+    return f"addr:{client[0] if client else ''}"
+
+
+class AdmissionControl:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route_class = admission.route_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if route_class is None or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope)
+        try:
+            await route_class.acquire(client)
+        except AdmissionRejected:
+            # fail fast instead of queueing on the threadpool and the db pool
+            response = ORJSONResponse(
+                {"detail": "Server is busy, try again later."},
+                status_code=503,
+                headers={"Retry-After": str(settings.admission_retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release(client)
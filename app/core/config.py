@@ -9,12 +9,78 @@ class Settings(BaseSettings):
     db_user: str
 
     database_url: str
-    supabase_url: str
-    supabase_key: str
-    supabase_storage_url: str
+    supabase_url: str = ""
+    supabase_key: str = ""
+    supabase_storage_url: str = ""
+
+    # "supabase" or "local"
+    storage_backend: str = "supabase"
+    local_storage_root: str = "./storage"
+    local_storage_url: str = "/api/files"
+
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # the Supabase pooler runs pgbouncer in transaction mode, which
+    # breaks server side prepared statements
+    db_statement_cache_size: int = 0
     
     jwt_secret: str
     jwt_algorithm: str
+    auth_cache_size: int = 10000
+    # also the longest a role change takes to reach the other workers,
+    # each worker caches on its own and only the editing one is invalidated
+    auth_cache_ttl: int = 30
+
+    bcrypt_rounds: int = 12
+    hash_workers: int = 2
+    hash_max_concurrency: int = 2
+    hash_max_queue: int = 64
+
+    admission_enabled: bool = True
+    admission_per_user: int = 8
+    # only behind a proxy that sets X-Forwarded-For, clients can forge it otherwise
+    admission_trust_forwarded: bool = False
+    admission_queue_timeout: float = 5
+    admission_retry_after: int = 1
+    admission_auth_limit: int = 8
+    admission_auth_queue: int = 64
+    admission_heavy_limit: int = 4
+    admission_heavy_queue: int = 32
+    admission_upload_limit: int = 16
+    admission_upload_queue: int = 32
+    admission_default_limit: int = 64
+    admission_default_queue: int = 256
+
+    page_default_limit: int = 50
+    page_max_limit: int = 200
+    bulk_max_items: int = 500
+    stream_chunk_size: int = 500
+
+    category_registry_ttl: int = 60
+
+    signed_url_expires_in: int = 60 * 60 * 24 * 31
+    signed_url_refresh_margin: int = 60 * 60 * 24
+    signed_url_cache_size: int = 50000
+
+    upload_chunk_size: int = 1024 * 1024
+    upload_max_size: int = 50 * 1024 * 1024
+    icon_max_size: int = 2 * 1024 * 1024
+    upload_tmp_dir: str = "/tmp/todo-uploads"
+    upload_session_ttl: int = 60 * 60 * 24
+    upload_prune_interval: int = 60 * 60
+
+    event_queue_size: int = 100
+    event_heartbeat: int = 25
+
+    sync_settle_seconds: int = 5
+    sync_max_changes: int = 500
+    tombstone_retention_days: int = 90
+
+    startup_warmup: bool = True
+    startup_budget_ms: int = 1500
 
     model_config = SettingsConfigDict(env_file=".env")
 
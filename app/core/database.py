@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine, URL
-from sqlalchemy.orm import sessionmaker, DeclarativeBase, declarative_base
+from functools import lru_cache
+
+from sqlalchemy import create_engine, make_url, Engine, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, declarative_base
 
 from .config import settings
+from .pool_metrics import MeteredPool, pool_metrics
 
 url = URL.create(
     drivername="postgresql+psycopg2",
@@ -12,7 +16,33 @@ url = URL.create(
     database=settings.db_name,
 )
 
-# engine = create_engine(url=url) # local database connection string
-engine = create_engine(url=settings.database_url) # supabase database connection string
+pool_options = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
 Base: DeclarativeBase = declarative_base()
-SessionLocal = sessionmaker(bind=engine)
+
+
+# sync engine for migrations and manage.py only, the API never needs psycopg2
+@lru_cache
+def get_engine() -> Engine:
+    # return create_engine(url=url, **pool_options) # local database connection string
+    return create_engine(url=settings.database_url, **pool_options) # supabase database connection string
+
+
+# async engine used by the API, same database through the asyncpg driver;
+# creating it does not connect, the pool opens connections on first checkout
+async_url = make_url(settings.database_url).set(drivername="postgresql+asyncpg")
+async_engine = create_async_engine(
+    url=async_url,
+    connect_args={"statement_cache_size": settings.db_statement_cache_size},
+    poolclass=MeteredPool,
+    **pool_options,
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+pool_metrics.attach(async_engine.sync_engine)
@@ -1,10 +1,8 @@
-from .database import SessionLocal
+from .database import AsyncSessionLocal
 
 
-def get_db():
-    db = SessionLocal()
-
-    try:
+async def get_db():
+    # the session checks a connection out on its first query, a request
+    # answered from caches never touches the pool (waits are timed there)
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
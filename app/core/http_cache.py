@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from hashlib import sha1
+
+from fastapi import Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def make_etag(*parts) -> str:
+    return '"' + sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str, headers: dict | None = None) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **(headers or {})}
+    )
+
+
+async def collection_etag(
+    request: Request, db: AsyncSession, user_id: int, models: tuple, *parts
+) -> tuple[str, dict]:
+    # version of a user's collection: row count plus newest update_at, answered
+    # from the (user_id, update_at) index alone; the count catches deletes
+    versions = []
+    last_modified: datetime | None = None
+
+    for model in models:
+        count, changed = (
+            await db.execute(
+                select(func.count(), func.max(model.update_at)).where(model.user_id == user_id)
+            )
+        ).one()
+        versions += [model.__tablename__, count, changed]
+        if changed and (last_modified is None or changed > last_modified):
+            last_modified = changed
+
+    # the query string is part of the key, every page / filter has its own tag
+    etag = make_etag(user_id, *versions, request.url.query, *parts)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    return etag, headers
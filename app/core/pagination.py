@@ -0,0 +1,70 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Annotated, Optional
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import literal, tuple_
+
+from .config import settings
+
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: Optional[str]
+
+
+def page_params(
+    limit: Annotated[int, Query(ge=1, le=settings.page_max_limit)] = settings.page_default_limit,
+    cursor: Annotated[Optional[str], Query()] = None,
+) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor)
+
+
+def encode_cursor(values: list) -> str:
+    values = [value.isoformat() if isinstance(value, date) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            column.type.python_type.fromisoformat(value)
+            if column.type.python_type in (date, datetime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
+
+
+def keyset(query, columns, page: PageParams, descending: bool = False):
+    # one extra row tells whether there is a next page
+    order = [column.desc() for column in columns] if descending else columns
+    query = query.order_by(*order).limit(page.limit + 1)
+
+    if page.cursor:
+        values = decode_cursor(page.cursor, columns)
+        row = tuple_(*columns)
+        after = tuple_(*(literal(v, c.type) for c, v in zip(columns, values)))
+        query = query.where(row < after if descending else row > after)
+
+    return query
+
+
+def page_of(rows, columns, page: PageParams) -> dict:
+    rows = list(rows)
+    next_cursor = None
+
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+    return {"items": rows, "limit": page.limit, "next_cursor": next_cursor}
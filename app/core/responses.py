@@ -0,0 +1,14 @@
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def columns_for(model, schema: type[BaseModel]) -> tuple:
+    # select only what the response needs, labelled with the schema's field names
+    return tuple(getattr(model, field).label(field) for field in schema.model_fields)
+
+
+def rows_response(result: dict) -> ORJSONResponse:
+    # rows come from our own typed select, so they are already valid for the
+    # response model; skip pydantic and let orjson encode datetimes and enums
+    result["items"] = [row if isinstance(row, dict) else row._asdict() for row in result["items"]]
+    return ORJSONResponse(result)
@@ -1,3 +1,6 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict
 from time import time
 import jwt
@@ -6,14 +9,98 @@ from passlib.hash import bcrypt
 from .config import settings
 
 
-def hash_password(plain_password: str) -> str:
-    return bcrypt.hash(plain_password)
+class HashingBusy(Exception):
+    pass
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+class HashingMetrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": settings.hash_workers,
+            "max_concurrency": settings.hash_max_concurrency,
+            "max_queue": settings.hash_max_queue,
+            "bcrypt_rounds": settings.bcrypt_rounds,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+        }
+
+
+hashing_metrics = HashingMetrics()
+_executor: ProcessPoolExecutor | None = None
+_slots: asyncio.Semaphore | None = None
+
+
+def _hash(plain_password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(plain_password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.verify(plain_password, hashed_password)
 
 
+async def _run_hashing(func, *args):
+    global _executor, _slots
+
+    if _executor is None:
+        # spawn instead of fork, the API process already runs threads
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.hash_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _slots = asyncio.Semaphore(settings.hash_max_concurrency)
+
+    if hashing_metrics.waiting >= settings.hash_max_queue:
+        hashing_metrics.rejected += 1
+        raise HashingBusy()
+
+    hashing_metrics.waiting += 1
+    hashing_metrics.max_waiting = max(hashing_metrics.max_waiting, hashing_metrics.waiting)
+    try:
+        await _slots.acquire()
+    finally:
+        hashing_metrics.waiting -= 1
+
+    hashing_metrics.in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        hashing_metrics.in_flight -= 1
+        hashing_metrics.completed += 1
+        _slots.release()
+
+
+def shutdown_hashing() -> None:
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+async def hash_password(plain_password: str) -> str:
+    return await _run_hashing(_hash, plain_password, settings.bcrypt_rounds)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(_verify, plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return bcrypt.using(rounds=settings.bcrypt_rounds).needs_update(hashed_password)
+
+
 def create_token(user_id: str) -> Dict[str, str]:
     payload = {"user_id": user_id, "expires": time() + 900}
     token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
@@ -0,0 +1,88 @@
+import logging
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+from sqlalchemy import text
+
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# name -> milliseconds, filled by the lifespan hook in app/main.py
+startup_timings: dict[str, float] = {}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+@contextmanager
+def timed(name: str):
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = (perf_counter() - started) * 1000
+
+
+async def warm_up() -> None:
+    # runs in the background after startup, a cold first request still works without it
+    from ..services.category_registry import category_registry
+
+    try:
+        with timed("warm up: database pool"):
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT 1"))
+        with timed("warm up: category registry"):
+            async with AsyncSessionLocal() as db:
+                await category_registry.load(db)
+    except Exception:
+        logger.exception("startup warm up failed")
+
+
+async def run_lifespan() -> tuple[float, float | None]:
+    # startup as a worker sees it, then the background warm up on its own:
+    # only the first counts against the budget, requests are served meanwhile
+    from ..main import app, lifespan
+
+    started = perf_counter()
+    async with lifespan(app):
+        startup_ms = (perf_counter() - started) * 1000
+
+        warm_up_ms = None
+        if app.state.warm_up is not None:
+            started = perf_counter()
+            await app.state.warm_up
+            warm_up_ms = (perf_counter() - started) * 1000
+    return startup_ms, warm_up_ms
+
+
+def import_report(module: str = "app.main") -> dict:
+    # import the app in a fresh interpreter with -X importtime and group the cost
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    packages = defaultdict(float)
+    app_modules = {}
+    total = 0.0
+
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+
+        self_us, cumulative_us, indent, name = match.groups()
+        if not indent:
+            total += int(cumulative_us) / 1000
+            packages[name.split(".")[0]] += int(cumulative_us) / 1000
+        if name == "app" or name.startswith("app."):
+            app_modules[name] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+
+    return {"total_ms": total, "packages": dict(packages), "app_modules": app_modules}
@@ -0,0 +1,171 @@
+import hashlib
+import hmac
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from time import time
+from typing import AsyncIterator
+from urllib.parse import quote, urlencode
+from uuid import uuid4
+
+import anyio
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    pass
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    async def upload(
+        self, bucket: str, path: str, chunks: AsyncIterator[bytes], content_type: str | None = None
+    ) -> None: ...
+
+    @abstractmethod
+    async def delete(self, bucket: str, paths: list[str]) -> None: ...
+
+    @abstractmethod
+    def public_url(self, bucket: str, path: str) -> str: ...
+
+    @abstractmethod
+    async def signed_urls(self, bucket: str, paths: list[str], expires_in: int) -> dict[str, str]: ...
+
+    async def signed_url(self, bucket: str, path: str, expires_in: int) -> str | None:
+        return (await self.signed_urls(bucket, [path], expires_in)).get(path)
+
+    async def close(self) -> None:
+        pass
+
+
+class SupabaseStorage(StorageBackend):
+    def __init__(self):
+        self._client = None
+        self._http: httpx.AsyncClient | None = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from supabase import create_client
+
+            self._client = create_client(
+                supabase_url=settings.supabase_url, supabase_key=settings.supabase_key
+            )
+        return self._client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(30, write=None))
+        return self._http
+
+    async def upload(self, bucket, path, chunks, content_type=None):
+        # the object endpoint takes a streamed body, storage3 would read it all first
+        response = await self.http.post(
+            f"{settings.supabase_url}/storage/v1/object/{bucket}/{quote(path)}",
+            content=chunks,
+            headers={
+                "Authorization": f"Bearer {settings.supabase_key}",
+                "apikey": settings.supabase_key,
+                "Content-Type": content_type or "application/octet-stream",
+                "x-upsert": "false",
+            },
+        )
+        if response.is_error:
+            raise StorageError(response.text)
+
+    async def delete(self, bucket, paths):
+        await run_in_threadpool(self.client.storage.from_(bucket).remove, paths)
+
+    def public_url(self, bucket, path):
+        return f"{settings.supabase_url}/storage/v1/object/public/{bucket}/{path}"
+
+    async def signed_urls(self, bucket, paths, expires_in):
+        signed = await run_in_threadpool(
+            self.client.storage.from_(bucket).create_signed_urls, paths, expires_in
+        )
+        return {
+            item["path"]: item["signedURL"]
+            for item in signed
+            if not item.get("error") and item.get("signedURL")
+        }
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+
+
+class LocalStorage(StorageBackend):
+    # files live under local_storage_root/<bucket>/<path> and are served by app/api/files.py
+    public_buckets = {"media"}
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def resolve(self, bucket: str, path: str) -> Path:
+        full_path = (self.root / bucket / path).resolve()
+        if not full_path.is_relative_to(self.root / bucket):
+            raise StorageError("Invalid path.")
+        return full_path
+
+    def signature(self, bucket: str, path: str, expires: int) -> str:
+        message = f"{bucket}/{path}:{expires}".encode()
+        return hmac.new(settings.jwt_secret.encode(), message, hashlib.sha256).hexdigest()
+
+    def verify(self, bucket: str, path: str, expires: int, signature: str) -> bool:
+        return expires > time() and hmac.compare_digest(self.signature(bucket, path, expires), signature)
+
+    async def upload(self, bucket, path, chunks, content_type=None):
+        full_path = anyio.Path(self.resolve(bucket, path))
+        if await full_path.exists():
+            raise StorageError("The resource already exists")
+
+        # written under a temporary name and renamed once complete, a failed or
+        # oversized upload never leaves a partial object behind
+        await full_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = full_path.with_name(f".{full_path.name}.{uuid4().hex}.part")
+        try:
+            async with await anyio.open_file(part_path, "wb") as file:
+                async for chunk in chunks:
+                    await file.write(chunk)
+            await part_path.rename(full_path)
+        except BaseException:
+            await part_path.unlink(missing_ok=True)
+            raise
+
+    async def delete(self, bucket, paths):
+        for path in paths:
+            await anyio.Path(self.resolve(bucket, path)).unlink(missing_ok=True)
+
+    def public_url(self, bucket, path):
+        return f"{settings.local_storage_url}/public/{bucket}/{quote(path)}"
+
+    async def signed_urls(self, bucket, paths, expires_in):
+        expires = int(time()) + expires_in
+        return {
+            path: f"{settings.local_storage_url}/signed/{bucket}/{quote(path)}?"
+            + urlencode({"expires": expires, "signature": self.signature(bucket, path, expires)})
+            for path in paths
+        }
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.local_storage_root)
+    return SupabaseStorage()
+
+
+async def delete_quietly(bucket: str, paths: list[str]) -> None:
+    # after the commit that dropped the rows: a failure leaves an orphaned
+    # object behind, never a row pointing at a missing file
+    try:
+        await get_storage().delete(bucket, paths)
+    except Exception:
+        logger.exception("could not delete %s from %s", paths, bucket)
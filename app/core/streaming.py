@@ -0,0 +1,81 @@
+import csv
+import io
+from enum import Enum
+from datetime import date
+from typing import Annotated, Awaitable, Callable, Iterable, Optional
+
+import orjson
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+
+def stream_format(
+    request: Request,
+    stream: Annotated[bool, Query(description="Stream the whole collection as one JSON array")] = False,
+) -> Optional[str]:
+    # Accept: application/x-ndjson or ?stream=true switch a list endpoint from pages to a stream
+    if NDJSON in request.headers.get("accept", ""):
+        return NDJSON
+    return JSON if stream else None
+
+
+def csv_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows: Iterable[Iterable]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def stream_rows(
+    db: AsyncSession,
+    query,
+    media_type: str,
+    transform: Optional[Callable[[list[dict]], Awaitable[list[dict]]]] = None,
+) -> StreamingResponse:
+    # rows come off a server side cursor settings.stream_chunk_size at a time and
+    # are written as they arrive, memory stays at one chunk whatever the total
+    query = query.execution_options(yield_per=settings.stream_chunk_size)
+
+    async def body():
+        # the request's session, get_db only closes it once the response is sent
+        result = await db.stream(query)
+        first = True
+
+        if media_type == JSON:
+            yield b"["
+        elif media_type == CSV:
+            yield csv_lines([result.keys()])
+
+        async for rows in result.partitions():
+            items = [row._asdict() for row in rows]
+            if transform:
+                items = await transform(items)
+
+            if media_type == NDJSON:
+                yield b"".join(orjson.dumps(item) + b"\n" for item in items)
+            elif media_type == CSV:
+                yield csv_lines(item.values() for item in items)
+            elif items:
+                chunk = b",".join(orjson.dumps(item) for item in items)
+                yield chunk if first else b"," + chunk
+                first = False
+
+        if media_type == JSON:
+            yield b"]"
+
+    return StreamingResponse(body(), media_type=media_type)
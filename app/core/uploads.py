@@ -0,0 +1,191 @@
+import fcntl
+import json
+import os
+from time import monotonic, time
+from typing import AsyncIterator
+from uuid import UUID, uuid4
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import ORJSONResponse
+
+from .config import settings
+
+
+def too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is larger than {max_size} bytes.",
+    )
+
+
+async def iter_upload(upload: UploadFile, max_size: int) -> AsyncIterator[bytes]:
+    # starlette knows the size once the multipart body is parsed, fail before streaming
+    if upload.size is not None and upload.size > max_size:
+        raise too_large(max_size)
+
+    size = 0
+    while chunk := await upload.read(settings.upload_chunk_size):
+        size += len(chunk)
+        if size > max_size:
+            raise too_large(max_size)
+        yield chunk
+
+
+# room for the multipart boundaries and the small form fields next to the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def body_limit(method: str, path: str) -> int | None:
+    if method == "POST" and path in ("/api/attechment/", "/api/tasks/import"):
+        return settings.upload_max_size + MULTIPART_OVERHEAD
+    if (method == "POST" and path == "/api/categories/") or (
+        method == "PUT" and path.startswith("/api/categories/")
+    ):
+        return settings.icon_max_size + MULTIPART_OVERHEAD
+    return None
+
+
+class UploadSizeLimit:
+    # starlette spools a whole multipart body before the handler (and iter_upload)
+    # sees it, so an oversized upload is turned away on its Content-Length instead;
+    # a body sent without one is still only checked after spooling
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = body_limit(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limit is not None:
+            length = dict(scope["headers"]).get(b"content-length")
+            if length and length.isdigit() and int(length) > limit:
+                response = ORJSONResponse(
+                    {"detail": f"Request body is larger than {limit} bytes."},
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+
+# resumable uploads: chunks are appended to a part file under upload_tmp_dir
+# (shared by the workers of one host) and streamed to storage on completion
+
+def _session_paths(upload_id: str) -> tuple[anyio.Path, anyio.Path]:
+    try:
+        upload_id = UUID(upload_id).hex
+    except ValueError:
+        raise upload_not_found()
+
+    base = anyio.Path(settings.upload_tmp_dir)
+    return base / f"{upload_id}.json", base / f"{upload_id}.part"
+
+
+def upload_not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+
+
+def offset_conflict(offset: int) -> HTTPException:
+    # resume point mismatch, the client asks GET /uploads/{upload_id} and retries
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Upload is at offset {offset}.")
+
+
+def _expired(modified: float) -> bool:
+    return modified < time() - settings.upload_session_ttl
+
+
+_last_prune = 0.0
+
+
+async def prune_sessions() -> int:
+    # abandoned sessions: nothing appended for upload_session_ttl seconds
+    global _last_prune
+    _last_prune = monotonic()
+
+    base = anyio.Path(settings.upload_tmp_dir)
+    if not await base.exists():
+        return 0
+
+    removed = 0
+    async for meta_path in base.glob("*.json"):
+        part_path = meta_path.with_suffix(".part")
+        try:
+            modified = (await part_path.stat()).st_mtime
+        except FileNotFoundError:
+            modified = (await meta_path.stat()).st_mtime
+        if _expired(modified):
+            await part_path.unlink(missing_ok=True)
+            await meta_path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+async def create_session(meta: dict) -> str:
+    # new sessions sweep the abandoned ones, at most once per upload_prune_interval
+    if monotonic() - _last_prune > settings.upload_prune_interval:
+        await prune_sessions()
+
+    upload_id = uuid4().hex
+    meta_path, part_path = _session_paths(upload_id)
+
+    await meta_path.parent.mkdir(parents=True, exist_ok=True)
+    await part_path.touch()
+    await meta_path.write_text(json.dumps(meta))
+    return upload_id
+
+
+async def load_session(upload_id: str, user_id: int) -> tuple[dict, int]:
+    meta_path, part_path = _session_paths(upload_id)
+
+    if not await meta_path.exists():
+        raise upload_not_found()
+
+    meta = json.loads(await meta_path.read_text())
+    if meta["user_id"] != user_id:
+        raise upload_not_found()
+
+    part = await part_path.stat()
+    if _expired(part.st_mtime):
+        raise upload_not_found()
+
+    return meta, part.st_size
+
+
+async def append_chunks(upload_id: str, size: int, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    _, part_path = _session_paths(upload_id)
+
+    async with await anyio.open_file(part_path, "ab") as part:
+        # one writer per session across the workers of this host, the offset is
+        # checked under the lock so two PUTs can never both append at it
+        fileno = part.wrapped.fileno()
+        try:
+            fcntl.flock(fileno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Another chunk is being written."
+            )
+
+        current = os.fstat(fileno).st_size
+        if current != offset:
+            raise offset_conflict(current)
+
+        async for chunk in chunks:
+            if offset + len(chunk) > size:
+                raise too_large(size)
+            await part.write(chunk)
+            offset += len(chunk)
+
+    return offset
+
+
+async def iter_session(upload_id: str) -> AsyncIterator[bytes]:
+    _, part_path = _session_paths(upload_id)
+
+    async with await anyio.open_file(part_path, "rb") as part:
+        while chunk := await part.read(settings.upload_chunk_size):
+            yield chunk
+
+
+async def drop_session(upload_id: str) -> None:
+    for path in _session_paths(upload_id):
+        await path.unlink(missing_ok=True)
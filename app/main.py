@@ -1,11 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .models import user, task
-from app.core.database import engine, Base
 from app.api.router import router
-from fastapi.staticfiles import StaticFiles
+from app.core.security import shutdown_hashing
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.storage import get_storage
+from app.core.startup import timed, warm_up
+from app.core.admission import AdmissionControl
+from app.core.uploads import UploadSizeLimit
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # nothing here may block on the network, workers must accept requests right away
+    with timed("lifespan startup"):
+        warm_up_task = asyncio.create_task(warm_up()) if settings.startup_warmup else None
+    app.state.warm_up = warm_up_task
+
+    yield
+
+    if warm_up_task:
+        warm_up_task.cancel()
+    shutdown_hashing()
+    await get_storage().close()
+    await async_engine.dispose()
 
-app = FastAPI(title="Todo List", version="1.0.0", description="FastAPI Todo List API")
+
+app = FastAPI(title="Todo List", version="1.0.0", description="FastAPI Todo List API", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.include_router(router, prefix="/api")
 
 origins = [
@@ -19,6 +45,11 @@ origins = [
     "http://192.168.1.8:3000"
 ]
 
+# inside CORS, so a 503 still carries the CORS headers
+app.add_middleware(AdmissionControl)
+# oversized uploads are refused before they take an admission slot
+app.add_middleware(UploadSizeLimit)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],   # ruxsat berilgan frontend URL
@@ -42,7 +73,3 @@ async def csp_middleware(request, call_next):
     return response
 
 
-
-
-# Base.metadata.drop_all(engine)
-Base.metadata.create_all(engine)
@@ -1,12 +1,24 @@
 from enum import Enum
 from datetime import datetime, timedelta
 
-from sqlalchemy import String, ForeignKey, DateTime, Column, Integer, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, String, ForeignKey, Date, DateTime, Column, Computed, Integer, Index, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from ..core.database import Base
 
 
+# 'simple' keeps every word as typed, task names are not all english
+SEARCH_CONFIG = "simple"
+
+
+def search_vector_of(name: str, description: str) -> str:
+    return (
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({name}, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({description}, '')), 'B')"
+    )
+
+
 class Priority(int, Enum):
     PRIORITY01 = 1
     PRIORITY02 = 2
@@ -32,7 +44,7 @@ class Category(Base):
     create_at = Column(DateTime, default=datetime.now)
     update_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
-    tasks = relationship("Task", back_populates="category", lazy="dynamic")
+    tasks = relationship("Task", back_populates="category", lazy="dynamic", passive_deletes=True)
 
     def __str__(self):
         return self.name
@@ -40,6 +52,14 @@ class Category(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_user_id_due_date_id", "user_id", "due_date", "id"),
+        Index("ix_tasks_user_id_status_priority_due_date", "user_id", "status", "priority", "due_date"),
+        UniqueConstraint("user_id", "name", name="uq_tasks_user_id_name"),
+        Index("ix_tasks_category_id", "category_id"),
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_tasks_user_id_update_at", "user_id", "update_at"),
+    )
 
     task_id = Column("id", Integer, primary_key=True, autoincrement=True)
     name = Column(String(length=64), nullable=False)
@@ -52,6 +72,10 @@ class Task(Base):
 
     create_at = Column(DateTime, default=datetime.now)
     update_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    # generated by postgres, only read by /tasks/search
+    search_vector = deferred(
+        Column(TSVECTOR, Computed(search_vector_of("name", "description"), persisted=True))
+    )
 
     sub_tasks = relationship("SubTask", back_populates="task")
     category = relationship("Category", back_populates="tasks")
@@ -61,6 +85,12 @@ class Task(Base):
 
 class SubTask(Base):
     __tablename__ = "sub_tasks"
+    __table_args__ = (
+        Index("ix_sub_tasks_user_id_id", "user_id", "id"),
+        Index("ix_sub_tasks_task_id", "task_id"),
+        Index("ix_sub_tasks_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_sub_tasks_user_id_update_at", "user_id", "update_at"),
+    )
 
     sub_task_id = Column("id", Integer, primary_key=True, autoincrement=True)
     name = Column(String(length=64), nullable=False)
@@ -70,6 +100,9 @@ class SubTask(Base):
 
     create_at = Column(DateTime, default=datetime.now)
     update_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    search_vector = deferred(
+        Column(TSVECTOR, Computed(search_vector_of("name", "description"), persisted=True))
+    )
 
     task = relationship("Task", back_populates="sub_tasks")
     user = relationship("User", back_populates="sub_tasks")
@@ -77,6 +110,11 @@ class SubTask(Base):
 
 class Attechment(Base):
     __tablename__ = "attechments"
+    __table_args__ = (
+        Index("ix_attechments_user_id_id", "user_id", "id"),
+        Index("ix_attechments_task_id", "task_id"),
+        Index("ix_attechments_user_id_update_at", "user_id", "update_at"),
+    )
 
     attechment_id = Column("id", Integer, primary_key=True, autoincrement=True)
     file_path = Column(String(length=255), nullable=False)
@@ -92,3 +130,46 @@ class Attechment(Base):
 
     def __str__(self):
         return self.attechment_id
+
+
+class UserTaskStats(Base):
+    __tablename__ = "user_task_stats"
+    __table_args__ = (
+        Index("ix_user_task_stats_total_user_id", "total", "user_id"),
+        Index("ix_user_task_stats_todo_user_id", "todo", "user_id"),
+        Index("ix_user_task_stats_doing_user_id", "doing", "user_id"),
+        Index("ix_user_task_stats_done_user_id", "done", "user_id"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    todo = Column(Integer, nullable=False, default=0)
+    doing = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
+
+
+class UserTaskDaily(Base):
+    # tasks created / moved to done per user and day, kept next to user_task_stats
+    __tablename__ = "user_task_daily"
+    __table_args__ = (
+        Index("ix_user_task_daily_day", "day"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+
+class Tombstone(Base):
+    # deleted tasks / subtasks / attachments, read by /sync/changes
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_user_id_deleted_at_id", "user_id", "deleted_at", "id"),
+    )
+
+    tombstone_id = Column("id", BigInteger, primary_key=True, autoincrement=True)
+    entity = Column(String(length=16), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    deleted_at = Column(DateTime, nullable=False, default=datetime.now)
@@ -0,0 +1,62 @@
+from pydantic import BaseModel
+
+
+class PoolWaits(BaseModel):
+    samples: int
+    avg: float
+    p50: float
+    p95: float
+    max: float
+
+
+class PoolStats(BaseModel):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    wait_ms: PoolWaits
+    connects: int
+    checkouts: int
+    checkins: int
+    invalidations: int
+    timeouts: int
+
+
+class HashingStats(BaseModel):
+    workers: int
+    max_concurrency: int
+    max_queue: int
+    bcrypt_rounds: int
+    in_flight: int
+    waiting: int
+    max_waiting: int
+    completed: int
+    rejected: int
+    rehashed: int
+
+
+class EventStats(BaseModel):
+    users: int
+    connections: int
+    queue_size: int
+    published: int
+    delivered: int
+    overflows: int
+
+
+class RouteClassStats(BaseModel):
+    limit: int
+    max_queue: int
+    active: int
+    waiting: int
+    max_waiting: int
+    waiting_users: int
+    admitted: int
+    rejected: int
+    timeouts: int
+
+
+class AdmissionStats(BaseModel):
+    per_user: int
+    queue_timeout: float
+    classes: dict[str, RouteClassStats]
@@ -1,5 +1,5 @@
-from datetime import datetime
-from pydantic import BaseModel
+from datetime import date, datetime
+from pydantic import BaseModel, Field
 
 from ..models.user import Role
 
@@ -28,3 +28,25 @@ class UserResponseDetalies(BaseModel):
 class UserEditRole(BaseModel):
     role: Role
     
+
+
+class UserTaskStatsResponse(BaseModel):
+    # served under the names /filter_by_task always used, existing admin clients keep working
+    user_id: int
+    username: str = Field(serialization_alias="name")
+    total: int = Field(serialization_alias="task_caunt")
+    todo: int = Field(serialization_alias="status_todo")
+    doing: int = Field(serialization_alias="status_doing")
+    done: int = Field(serialization_alias="status_done")
+
+    class Config:
+        from_attributes = True
+
+
+class TaskActivityResponse(BaseModel):
+    day: date
+    created: int
+    completed: int
+
+    class Config:
+        from_attributes = True
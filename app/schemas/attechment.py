@@ -4,4 +4,10 @@ from pydantic import BaseModel, Field
 class AttechmentResponse(BaseModel):
     attechment_id: int
     file_path: str
-    task_id: int
\ No newline at end of file
+    task_id: int
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    offset: int
+    size: int
+    chunk_size: int
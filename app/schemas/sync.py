@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import List
+from pydantic import BaseModel
+
+from .attechment import AttechmentResponse
+from .subtask import SubTaskResponse
+from .task import TaskResponse
+
+
+class DeletedItem(BaseModel):
+    entity: str
+    entity_id: int
+    deleted_at: datetime
+
+
+class SyncChanges(BaseModel):
+    tasks: List[TaskResponse]
+    subtasks: List[SubTaskResponse]
+    attachments: List[AttechmentResponse]
+    deleted: List[DeletedItem]
+    next_cursor: str
+    has_more: bool
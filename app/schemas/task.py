@@ -1,7 +1,11 @@
-from typing import Annotated, Optional
+from typing import Annotated, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
+from ..core.config import settings
 from ..models.task import Priority, TaskStatus
+from .attechment import AttechmentResponse
+from .categories import CategoryResponse
+from .subtask import SubTaskResponse
 from sqlalchemy import Enum as SQLEnum
 
 
@@ -32,6 +36,17 @@ class TaskResponse(BaseModel):
         from_attributes = True
 
 
+class TaskDetailResponse(TaskResponse):
+    # filled only when asked for with ?expand=
+    subtasks: Optional[List[SubTaskResponse]] = None
+    attachments: Optional[List[AttechmentResponse]] = None
+    category: Optional[CategoryResponse] = None
+
+
+class TaskSearchResponse(TaskDetailResponse):
+    rank: float
+
+
 class TaskUpdate(BaseModel):
     name: Optional[Annotated[str, Field(max_length=128, min_length=3)]] = None
     description: Optional[Annotated[str, Field(max_length=255)]] = None
@@ -39,3 +54,41 @@ class TaskUpdate(BaseModel):
     status: Optional[TaskStatus] = None
     priority: Optional[Priority] = None
     category_id: Optional[int] = None
+
+
+BulkTaskIds = Annotated[List[int], Field(min_length=1, max_length=settings.bulk_max_items)]
+
+
+class TaskBulkCreate(BaseModel):
+    tasks: Annotated[List[TaskCreate], Field(min_length=1, max_length=settings.bulk_max_items)]
+
+
+class TaskBulkUpdate(BaseModel):
+    task_ids: BulkTaskIds
+    due_date: Optional[datetime] = None
+    status: Optional[TaskStatus] = None
+    priority: Optional[Priority] = None
+    category_id: Optional[int] = None
+
+
+class TaskBulkDelete(BaseModel):
+    task_ids: BulkTaskIds
+
+
+class TaskBulkItem(BaseModel):
+    index: int
+    task_id: Optional[int] = None
+    ok: bool
+    detail: Optional[str] = None
+    task: Optional[TaskResponse] = None
+
+
+class TaskBulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[TaskBulkItem]
+
+
+class TaskImportResult(BaseModel):
+    imported: int
+    skipped: int
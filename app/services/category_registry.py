@@ -0,0 +1,97 @@
+import asyncio
+import json
+from time import monotonic
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.http_cache import make_etag
+from ..core.storage import get_storage
+from ..models.task import Category
+from ..schemas.categories import CategoryResponse
+
+
+def icon_key(icon: str) -> str:
+    # older rows stored the full public url instead of the storage path
+    return icon.split("/object/public/media/")[-1]
+
+
+def public_icon_url(icon_path: str) -> str:
+    return get_storage().public_url("media", icon_key(icon_path))
+
+
+class CategoryRegistry:
+    # process local copy of the categories table, every worker keeps its own
+    # and reloads it after a write or once it is older than category_registry_ttl
+
+    def __init__(self):
+        self.version = 0
+        self.categories: dict[int, CategoryResponse] = {}
+        self.items: dict[int, tuple[bytes, str]] = {}
+        self.payload = b"[]"
+        self.etag = make_etag(self.payload)
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or monotonic() - self._loaded_at > settings.category_registry_ttl
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    async def load(self, db: AsyncSession) -> None:
+        async with self._lock:
+            if not self.stale:
+                return
+
+            rows = await db.scalars(select(Category).order_by(Category.category_id))
+            categories = {
+                category.category_id: CategoryResponse(
+                    category_id=category.category_id,
+                    name=category.name,
+                    color=category.color,
+                    icon=public_icon_url(category.icon),
+                )
+                for category in rows
+            }
+            dumped = {pk: category.model_dump() for pk, category in categories.items()}
+
+            self.categories = categories
+            self.items = {}
+            for pk, item in dumped.items():
+                body = json.dumps(item).encode()
+                self.items[pk] = (body, make_etag(body))
+            self.payload = json.dumps(list(dumped.values())).encode()
+            self.etag = make_etag(self.payload)
+            self.version += 1
+            self._loaded_at = monotonic()
+
+    async def ensure(self, db: AsyncSession) -> "CategoryRegistry":
+        if self.stale:
+            await self.load(db)
+        return self
+
+    async def existing(self, db: AsyncSession, category_ids: set[int]) -> set[int]:
+        await self.ensure(db)
+        found = category_ids.intersection(self.categories)
+        missing = category_ids.difference(found)
+        if not missing:
+            return found
+
+        # may have been created by another worker since our last load: one
+        # primary key lookup for all misses, a bad id never reloads the table
+        created = set(
+            await db.scalars(select(Category.category_id).where(Category.category_id.in_(missing)))
+        )
+        if created:
+            # real new rows, picked up by the next ensure
+            self.invalidate()
+        return found | created
+
+    async def exists(self, db: AsyncSession, category_id: int) -> bool:
+        return category_id in await self.existing(db, {category_id})
+
+
+category_registry = CategoryRegistry()
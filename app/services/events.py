@@ -0,0 +1,83 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+
+import orjson
+
+from ..core.config import settings
+
+# sent in place of a backlog the client could not keep up with,
+# it then catches up through /sync/changes
+RESYNC = orjson.dumps({"entity": "sync", "action": "resync"}).decode()
+
+
+class Subscription:
+    # one per open websocket / SSE connection, bounded so a slow reader
+    # can never grow memory
+
+    def __init__(self, size: int):
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=size)
+
+    async def get(self) -> str:
+        return await self._queue.get()
+
+    def put(self, message: str) -> bool:
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC)
+            return False
+
+
+class EventBus:
+    # in-process fan-out: user_id -> that user's open connections on this worker
+
+    def __init__(self):
+        self._subscribers: dict[int, set[Subscription]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        subscription = Subscription(settings.event_queue_size)
+        self._subscribers[user_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscribers.get(user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: int, entity: str, action: str, ids: list[int], **extra) -> None:
+        # call after commit, a rolled back write must not be announced
+        self.published += 1
+        subscriptions = self._subscribers.get(user_id)
+        if not subscriptions:
+            return
+
+        # encoded once, every connection gets the same string
+        message = orjson.dumps({"entity": entity, "action": action, "ids": ids, **extra}).decode()
+        for subscription in subscriptions:
+            if subscription.put(message):
+                self.delivered += 1
+            else:
+                self.overflows += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+            "queue_size": settings.event_queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+
+event_bus = EventBus()
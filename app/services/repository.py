@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.task import Attechment, SubTask, Task
+
+
+class Scoped:
+    # single object access for user owned rows, ownership is part of the
+    # statement itself (WHERE id = :pk AND user_id = :uid), so each helper is one query
+
+    def __init__(self, model, pk, not_found: str):
+        self.model = model
+        self.pk = pk
+        self.not_found = not_found
+
+    def owned(self, pk: int, user_id: int) -> tuple:
+        return (self.pk == pk, self.model.user_id == user_id)
+
+    def missing(self) -> HTTPException:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=self.not_found)
+
+    async def exists(self, db: AsyncSession, pk: int, user_id: int) -> bool:
+        return bool(await db.scalar(select(literal(True)).where(*self.owned(pk, user_id))))
+
+    async def get(self, db: AsyncSession, pk: int, user_id: int, *columns):
+        # with columns a row of just those columns, otherwise the ORM object
+        if columns:
+            found = (await db.execute(select(*columns).where(*self.owned(pk, user_id)))).first()
+        else:
+            found = await db.scalar(select(self.model).where(*self.owned(pk, user_id)))
+
+        if found is None:
+            raise self.missing()
+        return found
+
+    async def update(self, db: AsyncSession, pk: int, user_id: int, values: dict):
+        if not values:
+            return await self.get(db, pk, user_id)
+
+        updated = await db.scalar(
+            update(self.model)
+            .where(*self.owned(pk, user_id))
+            .values(**values)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        if updated is None:
+            raise self.missing()
+        return updated
+
+    async def delete(self, db: AsyncSession, pk: int, user_id: int):
+        deleted = await db.scalar(
+            delete(self.model)
+            .where(*self.owned(pk, user_id))
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        if deleted is None:
+            raise self.missing()
+        return deleted
+
+    async def insert_for_task(self, db: AsyncSession, task_id: int, user_id: int, **values):
+        # INSERT ... SELECT from the user's own task row, a missing or foreign
+        # task inserts nothing and answers with "Task not found."
+        now = datetime.now()
+        values = {**values, "user_id": user_id, "create_at": now, "update_at": now}
+        columns = [getattr(self.model, key) for key in values]
+
+        source = select(
+            *(literal(value, column.type) for column, value in zip(columns, values.values())),
+            Task.task_id,
+        ).where(*tasks.owned(task_id, user_id))
+
+        created = await db.scalar(
+            insert(self.model)
+            .from_select([*columns, self.model.task_id], source)
+            .returning(self.model)
+        )
+        if created is None:
+            raise tasks.missing()
+        return created
+
+
+tasks = Scoped(Task, Task.task_id, "Task not found.")
+sub_tasks = Scoped(SubTask, SubTask.sub_task_id, "Sub Task not found.")
+attechments = Scoped(Attechment, Attechment.attechment_id, "Attechment not found")
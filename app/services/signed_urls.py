@@ -0,0 +1,55 @@
+from time import time
+from typing import Iterable
+
+from cachetools import TLRUCache
+
+from ..core.config import settings
+from ..core.storage import get_storage
+
+
+class SignedUrlCache:
+    # file_path -> (signed url, expires at), reused until refresh margin before expiry
+
+    def __init__(self, bucket: str):
+        self._bucket = bucket
+        self._cache = TLRUCache(
+            maxsize=settings.signed_url_cache_size,
+            ttu=lambda path, entry, now: entry[1] - settings.signed_url_refresh_margin,
+            timer=time,
+        )
+
+    async def get_many(self, paths: Iterable[str]) -> dict[str, str]:
+        urls = {}
+        missing = []
+
+        for path in dict.fromkeys(paths):
+            entry = self._cache.get(path)
+            if entry:
+                urls[path] = entry[0]
+            else:
+                missing.append(path)
+
+        if missing:
+            expires_in = settings.signed_url_expires_in
+            expires_at = time() + expires_in
+            signed = await get_storage().signed_urls(self._bucket, missing, expires_in)
+
+            for path, url in signed.items():
+                self._cache[path] = (url, expires_at)
+                urls[path] = url
+
+        return urls
+
+    async def get(self, path: str) -> str | None:
+        return (await self.get_many([path])).get(path)
+
+    def forget(self, path: str) -> None:
+        self._cache.pop(path, None)
+
+
+def url_generation() -> int:
+    # changes as often as cached urls get reissued, for etags over signed urls
+    return int(time() // settings.signed_url_refresh_margin)
+
+
+attechment_urls = SignedUrlCache("Attechments")
@@ -0,0 +1,96 @@
+from typing import Annotated, Optional
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.responses import columns_for
+from ..models.task import Attechment, SubTask
+from ..schemas.attechment import AttechmentResponse
+from ..schemas.subtask import SubTaskResponse
+from .category_registry import category_registry
+from .signed_urls import attechment_urls, url_generation
+
+EXPANDABLE = ("subtasks", "attachments", "category")
+
+SUBTASK_COLUMNS = columns_for(SubTask, SubTaskResponse)
+ATTECHMENT_COLUMNS = columns_for(Attechment, AttechmentResponse)
+
+
+def expand_params(
+    expand: Annotated[Optional[str], Query(description="Comma separated: subtasks, attachments, category")] = None,
+) -> frozenset[str]:
+    names = frozenset(name.strip() for name in (expand or "").split(",") if name.strip())
+    unknown = names.difference(EXPANDABLE)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown expand: {', '.join(sorted(unknown))}.",
+        )
+    return names
+
+
+def expanded_models(model, expand: frozenset[str]) -> tuple:
+    # tables whose changes show up in a response with this expand
+    return (
+        model,
+        *((SubTask,) if "subtasks" in expand else ()),
+        *((Attechment,) if "attachments" in expand else ()),
+    )
+
+
+async def expand_version(db: AsyncSession, expand: frozenset[str]) -> str:
+    # categories are shared, the registry's content etag is the same on every worker;
+    # signed attachment urls are reissued once per refresh margin
+    parts = []
+    if "category" in expand:
+        parts.append((await category_registry.ensure(db)).etag)
+    if "attachments" in expand:
+        parts.append(str(url_generation()))
+    return "|".join(parts)
+
+
+async def expand_tasks(db: AsyncSession, user_id: int, rows, expand: frozenset[str]) -> list[dict]:
+    # selectin style: one IN query per requested child for the whole page,
+    # the category comes from the in-process registry without a query
+    tasks = [row if isinstance(row, dict) else row._asdict() for row in rows]
+    if not expand or not tasks:
+        return tasks
+
+    by_id = {task["task_id"]: task for task in tasks}
+
+    if "subtasks" in expand:
+        for task in tasks:
+            task["subtasks"] = []
+        sub_tasks = await db.execute(
+            select(*SUBTASK_COLUMNS)
+            .where(SubTask.task_id.in_(list(by_id)), SubTask.user_id == user_id)
+            .order_by(SubTask.sub_task_id)
+        )
+        for sub_task in sub_tasks:
+            by_id[sub_task.task_id]["subtasks"].append(sub_task._asdict())
+
+    if "attachments" in expand:
+        for task in tasks:
+            task["attachments"] = []
+        attechments = (
+            await db.execute(
+                select(*ATTECHMENT_COLUMNS)
+                .where(Attechment.task_id.in_(list(by_id)), Attechment.user_id == user_id)
+                .order_by(Attechment.attechment_id)
+            )
+        ).all()
+        # only this page's files get signed, in one batch
+        urls = await attechment_urls.get_many(attechment.file_path for attechment in attechments)
+        for attechment in attechments:
+            item = attechment._asdict()
+            item["file_path"] = urls.get(attechment.file_path, "")
+            by_id[attechment.task_id]["attachments"].append(item)
+
+    if "category" in expand:
+        registry = await category_registry.ensure(db)
+        for task in tasks:
+            category = registry.categories.get(task["category_id"])
+            task["category"] = category.model_dump() if category else None
+
+    return tasks
@@ -0,0 +1,185 @@
+import csv
+from datetime import datetime
+from typing import AsyncIterator
+
+import orjson
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, SmallInteger, Table, Text,
+    case, cast, func, literal, select,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.task import Category, Priority, Task, TaskStatus
+from .task_stats import record_task_counts
+
+
+class TaskImportError(ValueError):
+    pass
+
+
+# same columns as the export, a CSV or NDJSON export can be imported back as is;
+# lives for one transaction only (ON COMMIT DROP)
+staging = Table(
+    "task_import",
+    MetaData(),
+    Column("task_id", Integer),
+    Column("name", Text),
+    Column("category_id", Integer),
+    Column("user_id", Integer),
+    Column("description", Text),
+    Column("due_date", DateTime),
+    Column("status", SmallInteger),
+    Column("priority", SmallInteger),
+    Column("create_at", DateTime),
+    Column("update_at", DateTime),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+REQUIRED_COLUMNS = {"name", "category_id", "due_date"}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def check_columns(columns: list[str]) -> list[str]:
+    unknown = set(columns).difference(staging.c.keys())
+    if unknown:
+        raise TaskImportError(f"Unknown columns: {', '.join(sorted(unknown))}.")
+    missing = REQUIRED_COLUMNS.difference(columns)
+    if missing:
+        raise TaskImportError(f"Missing columns: {', '.join(sorted(missing))}.")
+    return columns
+
+
+def record_of(item, line: int) -> tuple:
+    if not isinstance(item, dict):
+        raise TaskImportError(f"Line {line}: expected a JSON object.")
+
+    record = []
+    for column in staging.c:
+        value = item.get(column.key)
+        try:
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column.type, Integer):
+                value = int(value)
+            elif value is not None:
+                value = str(value)
+        except (TypeError, ValueError):
+            raise TaskImportError(f"Line {line}: invalid {column.key}.")
+        record.append(value)
+    return tuple(record)
+
+
+async def iter_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    line = 0
+    async for raw in iter_lines(chunks):
+        line += 1
+        if not raw.strip():
+            continue
+        try:
+            item = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            raise TaskImportError(f"Line {line}: invalid JSON.")
+        yield record_of(item, line)
+
+
+async def csv_body(chunks: AsyncIterator[bytes]) -> tuple[list[str], AsyncIterator[bytes]]:
+    # the header names the columns COPY reads, the rest goes to postgres untouched
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in buffer:
+            break
+
+    header, _, rest = buffer.partition(b"\n")
+    columns = next(csv.reader([header.decode("utf-8-sig").strip()]), [])
+
+    async def body():
+        if rest:
+            yield rest
+        async for chunk in chunks:
+            yield chunk
+
+    return check_columns([column.strip() for column in columns]), body()
+
+
+def merge_query(user_id: int):
+    now = datetime.now()
+    tasks = Task.__table__
+
+    source = select(
+        staging.c.name,
+        staging.c.description,
+        staging.c.category_id,
+        staging.c.due_date,
+        cast(
+            case({s.value: s.name for s in TaskStatus}, value=staging.c.status, else_=TaskStatus.TODO.name),
+            tasks.c.status.type,
+        ),
+        cast(
+            case({p.value: p.name for p in Priority}, value=staging.c.priority, else_=Priority.PRIORITY05.name),
+            tasks.c.priority.type,
+        ),
+        literal(user_id),
+        func.coalesce(staging.c.create_at, now),
+        # always now: collection etags rely on new rows raising max(update_at)
+        literal(now),
+    ).where(
+        # rows the constraints would reject are skipped, not fatal
+        func.char_length(staging.c.name).between(1, tasks.c.name.type.length),
+        func.coalesce(func.char_length(staging.c.description), 0) <= tasks.c.description.type.length,
+        staging.c.due_date.is_not(None),
+        staging.c.category_id.in_(select(Category.category_id)),
+    )
+
+    # names the user already has are left alone, so re-running an import is safe
+    return (
+        insert(tasks)
+        .from_select(
+            ["name", "description", "category_id", "due_date", "status", "priority",
+             "user_id", "create_at", "update_at"],
+            source,
+        )
+        .on_conflict_do_nothing(constraint="uq_tasks_user_id_name")
+        .returning(tasks.c.status)
+        .cte("imported")
+    )
+
+
+async def import_tasks(db: AsyncSession, user_id: int, chunks: AsyncIterator[bytes], csv_format: bool) -> dict:
+    connection = await db.connection()
+    await connection.run_sync(staging.create)
+    driver = (await connection.get_raw_connection()).driver_connection
+
+    # COPY into the staging table, rows are never held in memory as a whole
+    if csv_format:
+        columns, body = await csv_body(chunks)
+        await driver.copy_to_table(
+            staging.name, source=body, columns=columns, format="csv", header=False
+        )
+    else:
+        await driver.copy_records_to_table(
+            staging.name, records=iter_records(chunks), columns=staging.c.keys()
+        )
+
+    staged = await db.scalar(select(func.count()).select_from(staging))
+
+    # one INSERT ... SELECT merges everything, only per-status counts come back
+    imported = merge_query(user_id)
+    counts = dict((await db.execute(select(imported.c.status, func.count()).group_by(imported.c.status))).all())
+
+    await record_task_counts(db, user_id, {(None, task_status): count for task_status, count in counts.items()})
+
+    total = sum(counts.values())
+    return {"imported": total, "skipped": staged - total}
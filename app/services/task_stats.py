@@ -0,0 +1,165 @@
+from collections import Counter
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import delete, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.user import User
+from ..models.task import Task, TaskStatus, UserTaskDaily, UserTaskStats
+
+STATUS_COLUMNS = {
+    TaskStatus.TODO: "todo",
+    TaskStatus.DOING: "doing",
+    TaskStatus.DONE: "done",
+}
+
+
+async def record_task_change(
+    db: AsyncSession,
+    user_id: int,
+    old_status: Optional[TaskStatus] = None,
+    new_status: Optional[TaskStatus] = None,
+) -> None:
+    # old_status None -> task created, new_status None -> task deleted
+    await record_task_changes(db, user_id, [(old_status, new_status)])
+
+
+async def record_task_changes(
+    db: AsyncSession,
+    user_id: int,
+    changes: list[tuple[Optional[TaskStatus], Optional[TaskStatus]]],
+) -> None:
+    await record_task_counts(db, user_id, Counter(changes))
+
+
+async def record_task_counts(
+    db: AsyncSession,
+    user_id: int,
+    counts: dict[tuple[Optional[TaskStatus], Optional[TaskStatus]], int],
+) -> None:
+    # (old_status, new_status) -> number of tasks, for callers that only have aggregates
+    delta = {"total": 0, "todo": 0, "doing": 0, "done": 0}
+    activity = {"created": 0, "completed": 0}
+    for (old_status, new_status), count in counts.items():
+        if old_status == new_status:
+            continue
+        if old_status is None:
+            delta["total"] += count
+            activity["created"] += count
+        else:
+            delta[STATUS_COLUMNS[old_status]] -= count
+        if new_status is None:
+            delta["total"] -= count
+        else:
+            delta[STATUS_COLUMNS[new_status]] += count
+        if new_status == TaskStatus.DONE:
+            activity["completed"] += count
+
+    if not any(delta.values()):
+        return
+
+    query = insert(UserTaskStats).values(user_id=user_id, **delta)
+    query = query.on_conflict_do_update(
+        index_elements=[UserTaskStats.user_id],
+        set_={
+            column: getattr(UserTaskStats, column) + getattr(query.excluded, column)
+            for column, value in delta.items()
+            if value
+        },
+    )
+
+    if any(activity.values()):
+        # today's rollup row rides along as a data-modifying CTE, still one statement
+        daily = insert(UserTaskDaily).values(user_id=user_id, day=date.today(), **activity)
+        daily = daily.on_conflict_do_update(
+            index_elements=[UserTaskDaily.user_id, UserTaskDaily.day],
+            set_={
+                column: getattr(UserTaskDaily, column) + getattr(daily.excluded, column)
+                for column, value in activity.items()
+                if value
+            },
+        )
+        query = query.add_cte(daily.cte("daily"))
+
+    await db.execute(query)
+
+
+async def record_category_delete(db: AsyncSession, category_id: int) -> None:
+    # tasks go away through ON DELETE CASCADE, take them off every owner's counters first
+    removed = (
+        select(
+            Task.user_id,
+            func.count().label("total"),
+            func.count().filter(Task.status == TaskStatus.TODO).label("todo"),
+            func.count().filter(Task.status == TaskStatus.DOING).label("doing"),
+            func.count().filter(Task.status == TaskStatus.DONE).label("done"),
+        )
+        .where(Task.category_id == category_id)
+        .group_by(Task.user_id)
+        .subquery()
+    )
+    await db.execute(
+        update(UserTaskStats)
+        .where(UserTaskStats.user_id == removed.c.user_id)
+        .values(
+            total=UserTaskStats.total - removed.c.total,
+            todo=UserTaskStats.todo - removed.c.todo,
+            doing=UserTaskStats.doing - removed.c.doing,
+            done=UserTaskStats.done - removed.c.done,
+        )
+    )
+
+
+def rebuild_stats_query():
+    counts = (
+        select(
+            User.user_id,
+            func.count(Task.task_id),
+            func.count(Task.task_id).filter(Task.status == TaskStatus.TODO),
+            func.count(Task.task_id).filter(Task.status == TaskStatus.DOING),
+            func.count(Task.task_id).filter(Task.status == TaskStatus.DONE),
+        )
+        .outerjoin(Task, Task.user_id == User.user_id)
+        .group_by(User.user_id)
+    )
+    query = insert(UserTaskStats).from_select(
+        ["user_id", "total", "todo", "doing", "done"], counts
+    )
+    return query.on_conflict_do_update(
+        index_elements=[UserTaskStats.user_id],
+        set_={
+            column: getattr(query.excluded, column)
+            for column in ("total", "todo", "doing", "done")
+        },
+    )
+
+
+def rebuild_daily_queries() -> list:
+    # completion time is not stored, a done task counts on the day it was last updated
+    activity = union_all(
+        select(
+            Task.user_id,
+            func.date(Task.create_at).label("day"),
+            literal(1).label("created"),
+            literal(0).label("completed"),
+        ).where(Task.user_id.is_not(None), Task.create_at.is_not(None)),
+        select(
+            Task.user_id,
+            func.date(Task.update_at).label("day"),
+            literal(0).label("created"),
+            literal(1).label("completed"),
+        ).where(Task.user_id.is_not(None), Task.update_at.is_not(None), Task.status == TaskStatus.DONE),
+    ).subquery("activity")
+    rollup = select(
+        activity.c.user_id,
+        activity.c.day,
+        func.sum(activity.c.created),
+        func.sum(activity.c.completed),
+    ).group_by(activity.c.user_id, activity.c.day)
+
+    return [
+        delete(UserTaskDaily),
+        insert(UserTaskDaily).from_select(["user_id", "day", "created", "completed"], rollup),
+    ]
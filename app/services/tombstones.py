@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..models.task import Attechment, SubTask, Task, Tombstone
+
+TASK = "task"
+SUBTASK = "subtask"
+ATTACHMENT = "attachment"
+
+COLUMNS = ["entity", "entity_id", "user_id", "deleted_at"]
+
+
+async def bury(db: AsyncSession, entity: str, entity_id: int, user_id: int) -> None:
+    await db.execute(
+        insert(Tombstone).values(
+            entity=entity, entity_id=entity_id, user_id=user_id, deleted_at=datetime.now()
+        )
+    )
+
+
+async def bury_tasks(db: AsyncSession, *task_filter) -> dict[int, list[int]]:
+    # must run before the DELETE: subtasks and attachments go with their task
+    # through ON DELETE CASCADE and are gone afterwards;
+    # returns user_id -> buried task ids, for the change events
+    now = datetime.now()
+    task_ids = select(Task.task_id).where(*task_filter)
+
+    buried = (
+        insert(Tombstone).from_select(
+            COLUMNS,
+            union_all(
+                select(literal(TASK), Task.task_id, Task.user_id, literal(now))
+                .where(*task_filter),
+                select(literal(SUBTASK), SubTask.sub_task_id, SubTask.user_id, literal(now))
+                .where(SubTask.task_id.in_(task_ids)),
+                select(literal(ATTACHMENT), Attechment.attechment_id, Attechment.user_id, literal(now))
+                .where(Attechment.task_id.in_(task_ids)),
+            ),
+        )
+        .returning(Tombstone.entity, Tombstone.entity_id, Tombstone.user_id)
+        .cte("buried")
+    )
+
+    by_user = {}
+    for user_id, task_id in await db.execute(
+        select(buried.c.user_id, buried.c.entity_id).where(buried.c.entity == TASK)
+    ):
+        by_user.setdefault(user_id, []).append(task_id)
+    return by_user
+
+
+def prune_query():
+    # a client whose cursor is older than this has to sync from scratch
+    return delete(Tombstone).where(
+        Tombstone.deleted_at < datetime.now() - timedelta(days=settings.tombstone_retention_days)
+    )
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, select
+
+from app.core.config import settings
+from app.core.database import get_engine
+from app.core.uploads import prune_sessions
+from app.core.startup import import_report, run_lifespan, startup_timings
+from app.core.pagination import PageParams, keyset
+from app.models.user import User
+from app.models.task import Attechment, SubTask, Task, TaskStatus, UserTaskStats
+from app.services.task_stats import rebuild_daily_queries, rebuild_stats_query
+from app.services.tombstones import prune_query
+
+
+def alembic_config() -> Config:
+    return Config(str(Path(__file__).with_name("alembic.ini")))
+
+
+def migrate(args):
+    tables = inspect(get_engine()).get_table_names()
+
+    # databases created by the old create_all() already have the
+    # initial schema, adopt them instead of failing on CREATE TABLE
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(alembic_config(), "0001")
+
+    command.upgrade(alembic_config(), args.revision)
+
+
+def downgrade(args):
+    command.downgrade(alembic_config(), args.revision)
+
+
+def reconcile_stats(args):
+    with get_engine().begin() as connection:
+        result = connection.execute(rebuild_stats_query())
+        print(f"rebuilt task counters for {result.rowcount} users")
+
+        for query in rebuild_daily_queries():
+            result = connection.execute(query)
+        print(f"rebuilt {result.rowcount} daily activity rows")
+
+
+def prune_tombstones(args):
+    with get_engine().begin() as connection:
+        result = connection.execute(prune_query())
+    print(f"removed {result.rowcount} tombstones older than {settings.tombstone_retention_days} days")
+
+
+def prune_uploads(args):
+    removed = asyncio.run(prune_sessions())
+    print(f"removed {removed} upload sessions idle for over {settings.upload_session_ttl} seconds")
+
+
+def explain_queries(user_id: int) -> dict:
+    page = PageParams(limit=50, cursor=None)
+
+    return {
+        "tasks list": keyset(
+            select(Task).where(Task.user_id == user_id), (Task.due_date, Task.task_id), page
+        ),
+        "tasks filter": keyset(
+            select(Task).where(
+                Task.user_id == user_id,
+                Task.status == TaskStatus.TODO,
+                Task.due_date <= datetime.now(),
+            ),
+            (Task.due_date, Task.task_id),
+            page,
+        ),
+        "task by name": select(Task).where(Task.user_id == user_id, Task.name == "name"),
+        "subtasks list": keyset(
+            select(SubTask).where(SubTask.user_id == user_id), (SubTask.sub_task_id,), page
+        ),
+        "attechments list": keyset(
+            select(Attechment).where(Attechment.user_id == user_id), (Attechment.attechment_id,), page
+        ),
+        "profile counts": select(User, UserTaskStats)
+        .outerjoin(UserTaskStats, UserTaskStats.user_id == User.user_id)
+        .where(User.user_id == user_id),
+        "users list": keyset(select(User), (User.user_id,), page),
+    }
+
+
+def explain(args):
+    options = "ANALYZE, BUFFERS" if args.analyze else "COSTS"
+
+    engine = get_engine()
+
+    with engine.connect() as connection:
+        for name, query in explain_queries(args.user_id).items():
+            compiled = query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+            plan = connection.exec_driver_sql(f"EXPLAIN ({options}) {compiled}")
+
+            print(f"-- {name}")
+            for (line,) in plan:
+                print(line)
+            print()
+
+
+def startup_report(args):
+    budget = args.budget if args.budget is not None else settings.startup_budget_ms
+    report = import_report()
+
+    print(f"{'import':<40} {'cumulative ms':>14}")
+    for name, cumulative in sorted(report["packages"].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40} {cumulative:>14.1f}")
+
+    print(f"\n{'app module':<40} {'self ms':>8} {'cumulative ms':>14}")
+    for name, (self_ms, cumulative) in sorted(report["app_modules"].items(), key=lambda item: -item[1][1]):
+        print(f"{name:<40} {self_ms:>8.1f} {cumulative:>14.1f}")
+
+    lifespan_ms, warm_up_ms = asyncio.run(run_lifespan())
+    print(f"\n{'initialization':<40} {'ms':>8}")
+    for name, elapsed in startup_timings.items():
+        print(f"{name:<40} {elapsed:>8.1f}")
+    if warm_up_ms is not None:
+        print(f"{'background warm up (not budgeted)':<40} {warm_up_ms:>8.1f}")
+
+    total = report["total_ms"] + lifespan_ms
+    print(f"\nimport {report['total_ms']:.1f} ms + startup {lifespan_ms:.1f} ms = {total:.1f} ms (budget {budget} ms)")
+
+    if total > budget:
+        print("startup is over budget", file=sys.stderr)
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Todo List management commands")
+    commands = parser.add_subparsers(required=True)
+
+    parser_migrate = commands.add_parser("migrate", help="apply schema migrations")
+    parser_migrate.add_argument("revision", nargs="?", default="head")
+    parser_migrate.set_defaults(func=migrate)
+
+    parser_downgrade = commands.add_parser("downgrade", help="revert schema migrations ('base' drops everything)")
+    parser_downgrade.add_argument("revision")
+    parser_downgrade.set_defaults(func=downgrade)
+
+    parser_explain = commands.add_parser("explain", help="print query plans of the hot endpoints")
+    parser_explain.add_argument("--user-id", type=int, default=1)
+    parser_explain.add_argument("--analyze", action="store_true", help="run the queries (EXPLAIN ANALYZE)")
+    parser_explain.set_defaults(func=explain)
+
+    parser_reconcile = commands.add_parser("reconcile-stats", help="rebuild per-user task counters and daily rollups from the tasks table")
+    parser_reconcile.set_defaults(func=reconcile_stats)
+
+    parser_prune = commands.add_parser(
+        "prune-tombstones", help="drop deletion records older than TOMBSTONE_RETENTION_DAYS"
+    )
+    parser_prune.set_defaults(func=prune_tombstones)
+
+    parser_uploads = commands.add_parser(
+        "prune-uploads", help="drop resumable upload sessions idle for over UPLOAD_SESSION_TTL"
+    )
+    parser_uploads.set_defaults(func=prune_uploads)
+
+    parser_startup = commands.add_parser(
+        "startup-report", help="break down worker startup cost, exit 1 when over budget"
+    )
+    parser_startup.add_argument("--budget", type=int, help="milliseconds, defaults to STARTUP_BUDGET_MS")
+    parser_startup.add_argument("--top", type=int, default=15)
+    parser_startup.set_defaults(func=startup_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('username', sa.String(length=64), nullable=False, unique=True),
+        sa.Column('password', sa.String(length=128), nullable=False),
+        sa.Column('role', sa.Enum('USER', 'ADMIN', name='role'), nullable=False),
+        sa.Column('create_at', sa.DateTime()),
+        sa.Column('update_at', sa.DateTime()),
+    )
+    op.create_table(
+        'categories',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('name', sa.String(length=64), nullable=False, unique=True),
+        sa.Column('icon', sa.String(length=255), nullable=False),
+        sa.Column('color', sa.String(length=20), nullable=False),
+        sa.Column('create_at', sa.DateTime()),
+        sa.Column('update_at', sa.DateTime()),
+    )
+    op.create_table(
+        'tasks',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE')),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE')),
+        sa.Column('description', sa.String(length=255)),
+        sa.Column('due_date', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.Enum('TODO', 'DOING', 'DONE', name='taskstatus'), nullable=False),
+        sa.Column(
+            'priority',
+            sa.Enum('PRIORITY01', 'PRIORITY02', 'PRIORITY03', 'PRIORITY04', 'PRIORITY05', name='priority'),
+            nullable=False,
+        ),
+        sa.Column('create_at', sa.DateTime()),
+        sa.Column('update_at', sa.DateTime()),
+    )
+    op.create_table(
+        'sub_tasks',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('description', sa.String(length=255)),
+        sa.Column('task_id', sa.Integer(), sa.ForeignKey('tasks.id', ondelete='CASCADE')),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE')),
+        sa.Column('create_at', sa.DateTime()),
+        sa.Column('update_at', sa.DateTime()),
+    )
+    op.create_table(
+        'attechments',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('file_path', sa.String(length=255), nullable=False),
+        sa.Column('task_id', sa.Integer(), sa.ForeignKey('tasks.id', ondelete='CASCADE')),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE')),
+        sa.Column('create_at', sa.DateTime()),
+        sa.Column('update_at', sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('attechments')
+    op.drop_table('sub_tasks')
+    op.drop_table('tasks')
+    op.drop_table('categories')
+    op.drop_table('users')
+    sa.Enum(name='priority').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='taskstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='role').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,43 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # GET /tasks/ keyset pages, ordered by (due_date, id)
+    op.create_index('ix_tasks_user_id_due_date_id', 'tasks', ['user_id', 'due_date', 'id'])
+    # GET /tasks/filter
+    op.create_index(
+        'ix_tasks_user_id_status_priority_due_date', 'tasks', ['user_id', 'status', 'priority', 'due_date']
+    )
+    # duplicate name check on create/update
+    op.create_index('ix_tasks_user_id_name', 'tasks', ['user_id', 'name'])
+    # ON DELETE CASCADE from categories
+    op.create_index('ix_tasks_category_id', 'tasks', ['category_id'])
+
+    op.create_index('ix_sub_tasks_user_id_id', 'sub_tasks', ['user_id', 'id'])
+    op.create_index('ix_sub_tasks_task_id', 'sub_tasks', ['task_id'])
+
+    op.create_index('ix_attechments_user_id_id', 'attechments', ['user_id', 'id'])
+    op.create_index('ix_attechments_task_id', 'attechments', ['task_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_attechments_task_id', 'attechments')
+    op.drop_index('ix_attechments_user_id_id', 'attechments')
+    op.drop_index('ix_sub_tasks_task_id', 'sub_tasks')
+    op.drop_index('ix_sub_tasks_user_id_id', 'sub_tasks')
+    op.drop_index('ix_tasks_category_id', 'tasks')
+    op.drop_index('ix_tasks_user_id_name', 'tasks')
+    op.drop_index('ix_tasks_user_id_status_priority_due_date', 'tasks')
+    op.drop_index('ix_tasks_user_id_due_date_id', 'tasks')
@@ -0,0 +1,41 @@
+"""per-user task counters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_task_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('todo', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('doing', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('done', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.execute(
+        """
+        INSERT INTO user_task_stats (user_id, total, todo, doing, done)
+        SELECT users.id,
+               count(tasks.id),
+               count(tasks.id) FILTER (WHERE tasks.status = 'TODO'),
+               count(tasks.id) FILTER (WHERE tasks.status = 'DOING'),
+               count(tasks.id) FILTER (WHERE tasks.status = 'DONE')
+        FROM users LEFT OUTER JOIN tasks ON tasks.user_id = users.id
+        GROUP BY users.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_task_stats')
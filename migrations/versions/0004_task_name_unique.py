@@ -0,0 +1,36 @@
+"""unique task names per user
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the old check-then-insert could race, rename any duplicates it let through
+    op.execute(
+        """
+        UPDATE tasks
+        SET name = left(tasks.name, 61 - length(tasks.id::text)) || ' (' || tasks.id || ')'
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY user_id, name ORDER BY id) AS n
+            FROM tasks
+        ) AS duplicates
+        WHERE duplicates.id = tasks.id AND duplicates.n > 1
+        """
+    )
+    # the constraint's unique index also serves the (user_id, name) lookups
+    op.drop_index('ix_tasks_user_id_name', table_name='tasks')
+    op.create_unique_constraint('uq_tasks_user_id_name', 'tasks', ['user_id', 'name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_tasks_user_id_name', 'tasks', type_='unique')
+    op.create_index('ix_tasks_user_id_name', 'tasks', ['user_id', 'name'])
@@ -0,0 +1,45 @@
+"""daily task activity rollup
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_task_daily',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('created', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_user_task_daily_day', 'user_task_daily', ['day'])
+    # completion time is not stored, a done task counts on the day it was last updated
+    op.execute(
+        """
+        INSERT INTO user_task_daily (user_id, day, created, completed)
+        SELECT user_id, day, sum(created), sum(completed)
+        FROM (
+            SELECT user_id, create_at::date AS day, 1 AS created, 0 AS completed
+            FROM tasks WHERE user_id IS NOT NULL AND create_at IS NOT NULL
+            UNION ALL
+            SELECT user_id, update_at::date, 0, 1
+            FROM tasks WHERE user_id IS NOT NULL AND update_at IS NOT NULL AND status = 'DONE'
+        ) AS activity
+        GROUP BY user_id, day
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_task_daily_day', table_name='user_task_daily')
+    op.drop_table('user_task_daily')
@@ -0,0 +1,26 @@
+"""(user_id, update_at) indexes for collection etags
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+TABLES = ('tasks', 'sub_tasks', 'attechments')
+
+
+def upgrade() -> None:
+    # count(*) and max(update_at) per user come from these without touching the heap
+    for table in TABLES:
+        op.create_index(f'ix_{table}_user_id_update_at', table, ['user_id', 'update_at'])
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_user_id_update_at', table_name=table)
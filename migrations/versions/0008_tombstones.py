@@ -0,0 +1,31 @@
+"""deletion tombstones for the sync change feed
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('entity', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE')),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_tombstones_user_id_deleted_at_id', 'tombstones', ['user_id', 'deleted_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tombstones_user_id_deleted_at_id', table_name='tombstones')
+    op.drop_table('tombstones')
@@ -0,0 +1,33 @@
+"""sortable per-user task counters
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+SORT_COLUMNS = ('total', 'todo', 'doing', 'done')
+
+
+def upgrade() -> None:
+    # users registered since 0003 without ever creating a task have no row yet
+    op.execute(
+        """
+        INSERT INTO user_task_stats (user_id)
+        SELECT users.id FROM users
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    )
+    for column in SORT_COLUMNS:
+        op.create_index(f'ix_user_task_stats_{column}_user_id', 'user_task_stats', [column, 'user_id'])
+
+
+def downgrade() -> None:
+    for column in SORT_COLUMNS:
+        op.drop_index(f'ix_user_task_stats_{column}_user_id', table_name='user_task_stats')
@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import login, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_filter_by_task_pages_over_every_user(client, admin_auth, category):
+    # alice 3 tasks (1 done), bob 1 task, carol none
+    alice = await login(client, "alice")
+    for name in ("one", "two", "three"):
+        response = await client.post("/api/tasks/", json=task_body(name, category), headers=alice)
+    await client.put(f"/api/tasks/{response.json()['task_id']}", json={"status": 3}, headers=alice)
+    bob = await login(client, "bobby")
+    await client.post("/api/tasks/", json=task_body("one", category), headers=bob)
+    await login(client, "carol")
+
+    response = await client.get("/api/admin/filter_by_task", params={"limit": 2}, headers=admin_auth)
+    assert response.status_code == 200, response.text
+    first = response.json()
+    assert [(item["name"], item["task_caunt"], item["status_done"]) for item in first["items"]] == [
+        ("alice", 3, 1), ("bobby", 1, 0)
+    ]
+
+    response = await client.get(
+        "/api/admin/filter_by_task", params={"limit": 2, "cursor": first["next_cursor"]}, headers=admin_auth
+    )
+    second = response.json()
+    assert [(item["name"], item["task_caunt"]) for item in second["items"]] == [("carol", 0)]
+    assert second["next_cursor"] is None
+
+    response = await client.get(
+        "/api/admin/filter_by_task", params={"sort": "done", "order": "asc"}, headers=admin_auth
+    )
+    assert [item["name"] for item in response.json()["items"]] == ["bobby", "carol", "alice"]
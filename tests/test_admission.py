@@ -0,0 +1,217 @@
+import asyncio
+from base64 import b64encode
+
+import httpx
+import pytest
+
+from app.core.admission import AdmissionControl, AdmissionRejected, RouteClass, admission, client_key
+from app.core.config import settings
+from app.core.security import create_token
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def admission_settings(monkeypatch):
+    monkeypatch.setattr(settings, "admission_per_user", 2)
+    monkeypatch.setattr(settings, "admission_queue_timeout", 0.5)
+    monkeypatch.setattr(settings, "admission_trust_forwarded", False)
+
+
+async def hold(route_class: RouteClass, client: str, log: list, release: asyncio.Event):
+    await route_class.acquire(client)
+    log.append(client)
+    try:
+        await release.wait()
+    finally:
+        route_class.release(client)
+
+
+async def test_admits_up_to_limit_then_queues():
+    route_class = RouteClass("test", limit=2, max_queue=4)
+    await route_class.acquire("a")
+    await route_class.acquire("b")
+    assert route_class.active == 2
+
+    waiter = asyncio.create_task(route_class.acquire("c"))
+    await asyncio.sleep(0)
+    assert route_class.waiting == 1 and not waiter.done()
+
+    route_class.release("a")
+    await waiter
+    assert route_class.active == 2 and route_class.waiting == 0
+
+
+async def test_per_user_cap_applies_while_slots_are_free():
+    route_class = RouteClass("test", limit=10, max_queue=10)
+    await route_class.acquire("a")
+    await route_class.acquire("a")
+
+    with pytest.raises(AdmissionRejected):
+        await route_class.acquire("a")
+    assert route_class.active == 2 and route_class.rejected == 1
+
+    # other users still get in
+    await route_class.acquire("b")
+    assert route_class.active == 3
+
+
+async def test_rejects_when_queue_is_full():
+    route_class = RouteClass("test", limit=1, max_queue=1)
+    await route_class.acquire("a")
+    waiter = asyncio.create_task(route_class.acquire("b"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected):
+        await route_class.acquire("c")
+    assert route_class.rejected == 1
+
+    route_class.release("a")
+    await waiter
+
+
+async def test_queue_timeout_rejects_and_cleans_up(monkeypatch):
+    monkeypatch.setattr(settings, "admission_queue_timeout", 0.01)
+    route_class = RouteClass("test", limit=1, max_queue=4)
+    await route_class.acquire("a")
+
+    with pytest.raises(AdmissionRejected):
+        await route_class.acquire("b")
+    assert route_class.timeouts == 1
+    assert route_class.snapshot()["waiting"] == 0 and route_class.snapshot()["waiting_users"] == 0
+
+    route_class.release("a")
+    assert route_class.active == 0
+
+
+async def test_cancelled_waiter_leaves_no_state():
+    route_class = RouteClass("test", limit=1, max_queue=4)
+    await route_class.acquire("a")
+    waiter = asyncio.create_task(route_class.acquire("b"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    route_class.release("a")
+    assert route_class.active == 0 and route_class.waiting == 0
+
+
+async def test_freed_slots_go_round_robin_over_users():
+    route_class = RouteClass("test", limit=1, max_queue=10)
+    release = asyncio.Event()
+    log = []
+
+    await route_class.acquire("first")
+    # "a" queues two requests before "b" queues any
+    tasks = [asyncio.create_task(hold(route_class, client, log, release)) for client in ("a", "a", "b", "b")]
+    await asyncio.sleep(0)
+    assert route_class.waiting == 4
+
+    route_class.release("first")
+    for _ in range(4):
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0)
+        release.clear()
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert log == ["a", "b", "a", "b"]
+    assert route_class.active == 0
+
+
+def scope(path: str = "/api/tasks/", headers: dict | None = None, client=("10.0.0.1", 1234)) -> dict:
+    return {
+        "type": "http",
+        "path": path,
+        "headers": [(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": client,
+    }
+
+
+def test_client_key_by_token_login_and_address(monkeypatch):
+    token = create_token(7)
+    assert client_key(scope(headers={"authorization": f"Bearer {token}"})) == "user:7"
+
+    basic = b64encode(b"alice:secret").decode()
+    assert client_key(scope(headers={"authorization": f"Basic {basic}"})) == "login:alice"
+
+    assert client_key(scope(headers={"authorization": "Bearer forged"})) == "addr:10.0.0.1"
+
+    forwarded = {"x-forwarded-for": "1.1.1.1, 203.0.113.9"}
+    assert client_key(scope(headers=forwarded)) == "addr:10.0.0.1"
+    monkeypatch.setattr(settings, "admission_trust_forwarded", True)
+    assert client_key(scope(headers=forwarded)) == "addr:203.0.113.9"
+
+
+def test_route_classes():
+    assert admission.route_class("POST", "/api/auth/login").name == "auth"
+    assert admission.route_class("GET", "/api/tasks/export").name == "heavy"
+    assert admission.route_class("GET", "/api/tasks/").name == "default"
+    assert admission.route_class("GET", "/api/attechment/user_attechments").name == "heavy"
+    assert admission.route_class("POST", "/api/attechment/").name == "upload"
+    assert admission.route_class("PUT", "/api/attechment/uploads/abc").name == "upload"
+    assert admission.route_class("DELETE", "/api/attechment/1").name == "default"
+    assert admission.route_class("GET", "/api/admin/metrics/admission") is None
+    assert admission.route_class("GET", "/api/events") is None
+    assert admission.route_class("GET", "/docs") is None
+
+
+async def test_middleware_answers_503_with_retry_after(monkeypatch):
+    route_class = RouteClass("default", limit=1, max_queue=0)
+    monkeypatch.setitem(admission.classes, "default", route_class)
+    monkeypatch.setattr(settings, "admission_enabled", True)
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    transport = httpx.ASGITransport(app=AdmissionControl(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        running = asyncio.create_task(client.get("/api/tasks/"))
+        await asyncio.sleep(0.01)
+
+        response = await client.get("/api/tasks/")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(settings.admission_retry_after)
+
+        release.set()
+        assert (await running).status_code == 200
+
+    assert route_class.active == 0 and route_class.rejected == 1
+
+
+async def test_in_flight_upload_does_not_block_search(monkeypatch):
+    # one heavy slot and no queue: an upload holding it would turn search away
+    heavy = RouteClass("heavy", limit=1, max_queue=0)
+    upload = RouteClass("upload", limit=1, max_queue=0)
+    monkeypatch.setitem(admission.classes, "heavy", heavy)
+    monkeypatch.setitem(admission.classes, "upload", upload)
+    monkeypatch.setattr(settings, "admission_enabled", True)
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["method"] == "PUT":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    transport = httpx.ASGITransport(app=AdmissionControl(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        chunk = asyncio.create_task(
+            client.put("/api/attechment/uploads/abc", content=b"x", headers={"Upload-Offset": "0"})
+        )
+        await asyncio.sleep(0.01)
+        assert upload.active == 1
+
+        response = await client.get("/api/tasks/search", params={"q": "report"})
+        assert response.status_code == 200
+        assert heavy.rejected == 0
+
+        release.set()
+        assert (await chunk).status_code == 200
+
+    assert upload.active == 0 and heavy.active == 0
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import select
+
+from app.api import auth as auth_api
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.security import hash_password, hashing_metrics, shutdown_hashing, verify_password
+from app.models.user import User
+from conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def hashing_pool():
+    # a fresh pool per test, its semaphore belongs to the test's event loop
+    shutdown_hashing()
+    yield
+    shutdown_hashing()
+
+
+async def test_hashing_runs_in_the_process_pool():
+    completed = hashing_metrics.completed
+
+    hashed = await hash_password("password123")
+
+    assert hashed.startswith(f"$2b${settings.bcrypt_rounds:02d}$")
+    assert await verify_password("password123", hashed)
+    assert not await verify_password("wrong", hashed)
+    assert hashing_metrics.completed == completed + 3
+    assert hashing_metrics.in_flight == 0
+
+
+async def test_full_hashing_queue_answers_503(client, monkeypatch):
+    monkeypatch.setattr(settings, "hash_max_queue", 0)
+    rejected = hashing_metrics.rejected
+
+    response = await client.post(
+        "/api/auth/register",
+        json={"username": "alice", "password": "password123", "confirm": "password123"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert hashing_metrics.rejected == rejected + 1
+
+
+async def test_login_holds_no_connection_while_hashing(client, monkeypatch):
+    await login(client, "alice")
+    checked_out = []
+
+    async def verify(plain_password, hashed_password):
+        checked_out.append(async_engine.pool.checkedout())
+        return await verify_password(plain_password, hashed_password)
+
+    monkeypatch.setattr(auth_api, "verify_password", verify)
+    response = await client.post("/api/auth/login", auth=("alice", "password123"))
+    assert response.status_code == 200, response.text
+    assert checked_out == [0]
+
+
+async def test_login_rehashes_an_outdated_hash(client, db_session, monkeypatch):
+    await login(client, "alice")
+    rehashed = hashing_metrics.rehashed
+
+    monkeypatch.setattr(settings, "bcrypt_rounds", settings.bcrypt_rounds + 1)
+    response = await client.post("/api/auth/login", auth=("alice", "password123"))
+    assert response.status_code == 200, response.text
+
+    password = await db_session.scalar(select(User.password).where(User.username == "alice"))
+    assert password.startswith(f"$2b${settings.bcrypt_rounds:02d}$")
+    assert hashing_metrics.rehashed == rehashed + 1
+
+    # and the upgraded hash still logs in
+    response = await client.post("/api/auth/login", auth=("alice", "password123"))
+    assert response.status_code == 200
+    assert hashing_metrics.rehashed == rehashed + 1
@@ -0,0 +1,73 @@
+from time import time
+
+import pytest
+
+from app.api.deps import CurrentUser, invalidate_user, remember_token, token_cache, tokens_by_user
+from app.models.user import Role
+from conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    token_cache.clear()
+    tokens_by_user.clear()
+    yield
+    token_cache.clear()
+    tokens_by_user.clear()
+
+
+def test_invalidate_drops_only_that_users_tokens():
+    alice = CurrentUser(user_id=1, role=Role.USER, expires=time() + 600)
+    bob = CurrentUser(user_id=2, role=Role.USER, expires=time() + 600)
+    remember_token("alice-1", alice)
+    remember_token("alice-2", alice)
+    remember_token("bob-1", bob)
+
+    invalidate_user(1)
+
+    assert "alice-1" not in token_cache and "alice-2" not in token_cache
+    assert token_cache["bob-1"] == bob
+    assert 1 not in tokens_by_user and tokens_by_user[2] == {"bob-1"}
+
+
+def test_index_forgets_tokens_the_cache_expired():
+    alice = CurrentUser(user_id=1, role=Role.USER, expires=time() + 600)
+    remember_token("old", alice)
+    token_cache.pop("old")
+
+    remember_token("new", alice)
+    assert tokens_by_user[1] == {"new"}
+
+
+async def test_role_edit_applies_on_the_next_request(client, admin_auth):
+    user_headers = await login(client, "alice")
+
+    response = await client.get("/api/users/profile", headers=user_headers)
+    assert response.status_code == 200
+    user_id = response.json()["user"]["user_id"]
+
+    response = await client.put(f"/api/admin/{user_id}", json={"role": "admin"}, headers=admin_auth)
+    assert response.status_code == 200, response.text
+
+    # the cached USER entry is gone, the profile endpoint now refuses the admin
+    response = await client.get("/api/users/profile", headers=user_headers)
+    assert response.status_code == 403
+
+
+async def test_profile_of_a_user_deleted_behind_a_cached_token(client, db_session):
+    from sqlalchemy import delete
+
+    from app.models.user import User
+
+    headers = await login(client, "alice")
+    response = await client.get("/api/users/profile", headers=headers)
+    assert response.status_code == 200
+
+    # deleted straight in the database: the cached token still resolves
+    await db_session.execute(delete(User).where(User.username == "alice"))
+    await db_session.commit()
+
+    response = await client.get("/api/users/profile", headers=headers)
+    assert response.status_code == 404
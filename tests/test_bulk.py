@@ -0,0 +1,96 @@
+import pytest
+
+from conftest import login, profile_result, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def bulk_create(client, auth, category, *names) -> list[int]:
+    response = await client.post(
+        "/api/tasks/bulk", json={"tasks": [task_body(name, category) for name in names]}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    return [item["task_id"] for item in response.json()["items"]]
+
+
+async def test_bulk_create_reports_each_item(client, auth, category):
+    await client.post("/api/tasks/", json=task_body("taken", category), headers=auth)
+
+    response = await client.post(
+        "/api/tasks/bulk",
+        json={"tasks": [
+            task_body("first", category),
+            task_body("taken", category),
+            task_body("orphan", category + 100),
+            task_body("first", category),
+            task_body("second", category),
+        ]},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["succeeded"], result["failed"]) == (2, 3)
+    assert [item["ok"] for item in result["items"]] == [True, False, False, False, True]
+    assert result["items"][2]["detail"] == "Category not found."
+    assert result["items"][4]["task"]["name"] == "second"
+
+    assert await profile_result(client, auth) == {
+        "task_count": 3, "task_todo": 3, "task_doing": 0, "task_done": 0
+    }
+
+
+async def test_bulk_update_moves_counters(client, auth, category):
+    task_ids = await bulk_create(client, auth, category, "one", "two", "three")
+    other_id = (await bulk_create(client, await login(client, "mallory"), category, "theirs"))[0]
+
+    response = await client.patch(
+        "/api/tasks/bulk", json={"task_ids": [*task_ids[:2], other_id], "status": 3}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["succeeded"], result["failed"]) == (2, 1)
+    assert result["items"][2] == {
+        "index": 2, "task_id": other_id, "ok": False, "detail": "Task not found.", "task": None
+    }
+    assert {item["task"]["status"] for item in result["items"][:2]} == {3}
+
+    assert await profile_result(client, auth) == {
+        "task_count": 3, "task_todo": 1, "task_doing": 0, "task_done": 2
+    }
+
+    response = await client.patch("/api/tasks/bulk", json={"task_ids": task_ids}, headers=auth)
+    assert response.status_code == 400
+
+
+async def test_bulk_delete_moves_counters(client, auth, category):
+    task_ids = await bulk_create(client, auth, category, "one", "two", "three")
+    await client.patch("/api/tasks/bulk", json={"task_ids": task_ids[:1], "status": 3}, headers=auth)
+
+    response = await client.request(
+        "DELETE", "/api/tasks/bulk", json={"task_ids": [task_ids[0], task_ids[1], 9999]}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert [item["ok"] for item in response.json()["items"]] == [True, True, False]
+
+    assert await profile_result(client, auth) == {
+        "task_count": 1, "task_todo": 1, "task_doing": 0, "task_done": 0
+    }
+    response = await client.get("/api/tasks/", headers=auth)
+    assert [item["task_id"] for item in response.json()["items"]] == [task_ids[2]]
+
+
+async def test_bulk_update_to_a_vanished_category_is_not_found(client, auth, category, monkeypatch):
+    from app.services.category_registry import category_registry
+
+    task_ids = await bulk_create(client, auth, category, "one", "two")
+
+    # the registry still knows a category that another worker just deleted
+    async def exists(db, category_id):
+        return True
+
+    monkeypatch.setattr(category_registry, "exists", exists)
+    response = await client.patch(
+        "/api/tasks/bulk", json={"task_ids": task_ids, "category_id": category + 100}, headers=auth
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Category not found."
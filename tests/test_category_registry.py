@@ -0,0 +1,35 @@
+import pytest
+
+from app.models.task import Category
+from app.services.category_registry import category_registry
+from conftest import task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_unknown_ids_do_not_reload_the_registry(client, auth, category, db_session):
+    await category_registry.ensure(db_session)
+    version = category_registry.version
+
+    response = await client.post(
+        "/api/tasks/bulk",
+        json={"tasks": [task_body(f"task {n}", 1000 + n) for n in range(5)] + [task_body("real", category)]},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+    assert [item["ok"] for item in response.json()["items"]] == [False] * 5 + [True]
+    assert category_registry.version == version
+
+
+async def test_category_created_elsewhere_is_found(db_session):
+    await category_registry.ensure(db_session)
+
+    # inserted behind the registry's back, as another worker would
+    category = Category(name="late")
+    db_session.add(category)
+    await db_session.commit()
+
+    assert await category_registry.existing(db_session, {category.category_id, 999}) == {category.category_id}
+    await category_registry.ensure(db_session)
+    assert category.category_id in category_registry.categories
+
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from time import time
+
+import orjson
+import pytest
+
+from app.api.deps import CurrentUser, remember_token, token_cache, tokens_by_user
+from app.api.events import events_socket
+from app.models.user import Role
+from app.services.events import RESYNC, Subscription, event_bus
+from conftest import task_body
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSocket:
+    def __init__(self, fail_send: bool = False):
+        self.fail_send = fail_send
+        self.sent = []
+        self.closed_with = None
+        self.disconnect = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.fail_send:
+            raise RuntimeError("broken pipe")
+        self.sent.append(orjson.loads(text))
+
+    async def receive(self):
+        await self.disconnect.wait()
+        return {"type": "websocket.disconnect"}
+
+    async def close(self, code: int):
+        self.closed_with = code
+
+
+@pytest.fixture
+def token():
+    remember_token("events-token", CurrentUser(user_id=42, role=Role.USER, expires=time() + 60))
+    yield "events-token"
+    token_cache.clear()
+    tokens_by_user.clear()
+
+
+def test_overflow_replaces_the_backlog_with_resync():
+    subscription = Subscription(2)
+    assert subscription.put("a") and subscription.put("b")
+    assert not subscription.put("c")
+    assert subscription._queue.qsize() == 1 and subscription._queue.get_nowait() == RESYNC
+
+
+async def test_socket_delivers_events_until_the_client_leaves(token):
+    socket = FakeSocket()
+    handler = asyncio.create_task(events_socket(socket, token))
+    await asyncio.sleep(0.01)
+
+    event_bus.publish(42, "task", "created", [7])
+    await asyncio.sleep(0.01)
+    socket.disconnect.set()
+    await handler
+
+    assert socket.sent == [{"entity": "task", "action": "created", "ids": [7]}]
+    assert socket.closed_with is None
+    assert event_bus.snapshot()["connections"] == 0
+
+
+async def test_socket_send_failure_is_logged_and_closed(token, caplog):
+    socket = FakeSocket(fail_send=True)
+    handler = asyncio.create_task(events_socket(socket, token))
+    await asyncio.sleep(0.01)
+
+    with caplog.at_level(logging.ERROR, logger="app.api.events"):
+        event_bus.publish(42, "task", "created", [7])
+        await asyncio.wait_for(handler, 1)
+
+    assert socket.closed_with == 1011
+    assert "event socket for user 42 failed" in caplog.text
+
+
+async def test_socket_closes_when_the_token_expires():
+    remember_token("short", CurrentUser(user_id=43, role=Role.USER, expires=time() + 0.05))
+    socket = FakeSocket()
+    await asyncio.wait_for(events_socket(socket, "short"), 1)
+    assert socket.closed_with == 1008
+
+
+async def test_task_writes_are_published(client, auth, category):
+    response = await client.get("/api/users/profile", headers=auth)
+    user_id = response.json()["user"]["user_id"]
+
+    with event_bus.subscribe(user_id) as subscription:
+        response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+        task_id = response.json()["task_id"]
+        await client.put(f"/api/tasks/{task_id}", json={"status": 2}, headers=auth)
+        await client.delete(f"/api/tasks/{task_id}", headers=auth)
+
+        messages = [orjson.loads(subscription._queue.get_nowait()) for _ in range(3)]
+
+    assert [(message["action"], message["ids"]) for message in messages] == [
+        ("created", [task_id]), ("updated", [task_id]), ("deleted", [task_id])
+    ]
+
+
+async def test_category_delete_publishes_cascaded_task_deletes(client, auth, admin_auth, category):
+    task_ids = []
+    for name in ("first", "second"):
+        response = await client.post("/api/tasks/", json=task_body(name, category), headers=auth)
+        task_ids.append(response.json()["task_id"])
+    user_id = (await client.get("/api/users/profile", headers=auth)).json()["user"]["user_id"]
+
+    with event_bus.subscribe(user_id) as subscription:
+        response = await client.delete(f"/api/categories/{category}", headers=admin_auth)
+        assert response.status_code == 204
+
+        message = orjson.loads(subscription._queue.get_nowait())
+
+    assert message["entity"] == "task" and message["action"] == "deleted"
+    assert sorted(message["ids"]) == task_ids
@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_task_list_etag_with_expanded_attachments(client, auth, category):
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    task_id = response.json()["task_id"]
+
+    response = await client.get("/api/tasks/", params={"expand": "attachments"}, headers=auth)
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+    assert response.json()["items"][0]["attachments"] == []
+
+    response = await client.get(
+        "/api/tasks/", params={"expand": "attachments"}, headers={**auth, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = await client.post(
+        "/api/attechment/",
+        data={"task_id": str(task_id)},
+        files={"att_file": ("notes.txt", b"hello", "text/plain")},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+
+    response = await client.get(
+        "/api/tasks/", params={"expand": "attachments"}, headers={**auth, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()["items"][0]["attachments"]) == 1
+
+
+async def test_etag_differs_per_expand(client, auth, category):
+    await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+
+    plain = await client.get("/api/tasks/", headers=auth)
+    expanded = await client.get("/api/tasks/", params={"expand": "attachments,category"}, headers=auth)
+    assert expanded.status_code == 200, expanded.text
+    assert plain.headers["ETag"] != expanded.headers["ETag"]
@@ -0,0 +1,80 @@
+import orjson
+import pytest
+
+from conftest import login, profile_result, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+def ndjson(*rows) -> bytes:
+    return b"\n".join(orjson.dumps(row) for row in rows) + b"\n"
+
+
+async def test_import_ndjson_updates_counters(client, auth, category):
+    body = ndjson(
+        {"name": "first", "category_id": category, "due_date": "2030-01-01T00:00:00", "status": 1},
+        {"name": "second", "category_id": category, "due_date": "2030-01-02T00:00:00", "status": 3},
+        {"name": "third", "category_id": category, "due_date": "2030-01-03T00:00:00", "status": 3},
+        # skipped: unknown category, missing due date
+        {"name": "orphan", "category_id": category + 100, "due_date": "2030-01-04T00:00:00"},
+        {"name": "undated", "category_id": category},
+    )
+    response = await client.post(
+        "/api/tasks/import", files={"file": ("tasks.ndjson", body, "application/x-ndjson")}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"imported": 3, "skipped": 2}
+
+    assert await profile_result(client, auth) == {"task_count": 3, "task_todo": 1, "task_doing": 0, "task_done": 2}
+
+
+async def test_import_rejects_bad_lines(client, auth, category):
+    response = await client.post(
+        "/api/tasks/import", files={"file": ("tasks.ndjson", b"{not json\n", "application/x-ndjson")}, headers=auth
+    )
+    assert response.status_code == 400
+    assert "Line 1" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("format, media_type", [("ndjson", "application/x-ndjson"), ("csv", "text/csv")])
+async def test_export_round_trips_through_import(client, auth, category, format, media_type):
+    for name in ("alpha", "beta", "gamma"):
+        await client.post("/api/tasks/", json=task_body(name, category), headers=auth)
+
+    response = await client.get("/api/tasks/export", params={"format": format}, headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith(media_type)
+    exported = response.content
+
+    other = await login(client, "bob")
+    response = await client.post(
+        "/api/tasks/import", files={"file": (f"tasks.{format}", exported, media_type)}, headers=other
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"imported": 3, "skipped": 0}
+
+    # a second import of the same file is a no-op
+    response = await client.post(
+        "/api/tasks/import", files={"file": (f"tasks.{format}", exported, media_type)}, headers=other
+    )
+    assert response.json() == {"imported": 0, "skipped": 3}
+
+
+async def test_task_list_streams_every_row_in_chunks(client, auth, category, monkeypatch):
+    from app.core.config import settings
+
+    # several server side cursor chunks for five rows
+    monkeypatch.setattr(settings, "stream_chunk_size", 2)
+    for name in ("one", "two", "three", "four", "five"):
+        await client.post("/api/tasks/", json=task_body(name, category), headers=auth)
+
+    # paging parameters don't apply to a stream
+    response = await client.get("/api/tasks/", params={"stream": "true", "limit": 1}, headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/json"
+    assert sorted(task["name"] for task in response.json()) == ["five", "four", "one", "three", "two"]
+
+    response = await client.get("/api/tasks/", headers={**auth, "Accept": "application/x-ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.content.splitlines()
+    assert len(lines) == 5 and orjson.loads(lines[0])["name"] == "one"
@@ -0,0 +1,47 @@
+import pytest
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.dependencies import get_db
+from app.core.pool_metrics import MeteredPool, pool_metrics
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cached_requests_do_not_check_out_a_connection(client, auth):
+    # first call loads the category registry, the second is served from memory
+    response = await client.get("/api/categories/", headers=auth)
+    assert response.status_code == 200
+
+    checkouts = pool_metrics.checkouts
+    response = await client.get("/api/categories/", headers=auth)
+    assert response.status_code == 200
+    assert pool_metrics.checkouts == checkouts
+
+
+async def test_checkouts_record_a_wait_sample(client, auth):
+    samples = pool_metrics.snapshot()["wait_ms"]["samples"]
+
+    response = await client.get("/api/users/profile", headers=auth)
+    assert response.status_code == 200
+
+    snapshot = pool_metrics.snapshot()
+    assert snapshot["wait_ms"]["samples"] > samples or samples == 1000
+    assert snapshot["checked_out"] == 0
+
+
+async def test_requests_get_a_lazy_async_session():
+    # the api runs on asyncpg through the metered, configured pool
+    assert async_engine.dialect.driver == "asyncpg"
+    assert isinstance(async_engine.pool, MeteredPool)
+    assert async_engine.pool.size() == settings.db_pool_size
+    assert async_engine.pool.timeout() == settings.db_pool_timeout
+
+    checkouts = pool_metrics.checkouts
+    sessions = get_db()
+    db = await sessions.__anext__()
+    assert isinstance(db, AsyncSession)
+    await sessions.aclose()
+    assert pool_metrics.checkouts == checkouts
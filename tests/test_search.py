@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import login, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_task(client, auth, category, name, **extra) -> dict:
+    response = await client.post("/api/tasks/", json=task_body(name, category, **extra), headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_search_ranks_tasks_and_subtasks_of_the_user(client, auth, category):
+    named = await create_task(client, auth, category, "quarterly report")
+    described = await create_task(client, auth, category, "friday", description="send the report to finance")
+    parent = await create_task(client, auth, category, "release")
+    await create_task(client, auth, category, "groceries")
+    await create_task(client, await login(client, "mallory"), category, "report for mallory")
+
+    response = await client.post(
+        "/api/subtask/",
+        json={"user_id": parent["user_id"], "task_id": parent["task_id"], "name": "report draft"},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+
+    response = await client.get("/api/tasks/search", params={"q": "report"}, headers=auth)
+    assert response.status_code == 200, response.text
+    items = response.json()["items"]
+    assert {item["task_id"] for item in items} == {named["task_id"], described["task_id"], parent["task_id"]}
+    ranks = [item["rank"] for item in items]
+    assert ranks == sorted(ranks, reverse=True)
+
+    response = await client.get("/api/tasks/search", params={"q": "report", "limit": 2}, headers=auth)
+    page = response.json()
+    response = await client.get(
+        "/api/tasks/search", params={"q": "report", "limit": 2, "cursor": page["next_cursor"]}, headers=auth
+    )
+    assert len(page["items"]) + len(response.json()["items"]) == 3
+
+
+async def test_search_needs_a_query(client, auth):
+    response = await client.get("/api/tasks/search", params={"q": ""}, headers=auth)
+    assert response.status_code == 422
+
+
+async def test_search_reads_the_gin_indexes(db_session):
+    from sqlalchemy import text
+
+    await db_session.execute(text("SET LOCAL enable_seqscan = off"))
+    for table in ("tasks", "sub_tasks"):
+        plan = "\n".join(
+            await db_session.scalars(
+                text(
+                    f"EXPLAIN SELECT id FROM {table} WHERE user_id = 1 "
+                    "AND search_vector @@ websearch_to_tsquery('simple', 'report')"
+                )
+            )
+        )
+        assert f"ix_{table}_search_vector" in plan
+    await db_session.rollback()
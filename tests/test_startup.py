@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.config import settings
+from app.core.startup import import_report, run_lifespan
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_startup_stays_within_budget():
+    # a fresh interpreter pays the full import cost, the lifespan runs without warm up;
+    # best of three so a noisy host does not fail the build
+    report = min((import_report() for _ in range(3)), key=lambda report: report["total_ms"])
+    startup_ms, warm_up_ms = await run_lifespan()
+
+    assert warm_up_ms is None
+    total = report["total_ms"] + startup_ms
+    assert total <= settings.startup_budget_ms, (
+        f"startup took {total:.0f} ms, budget is {settings.startup_budget_ms} ms; "
+        f"see python manage.py startup-report"
+    )
+
+
+async def test_warm_up_is_measured_separately(database, monkeypatch):
+    monkeypatch.setattr(settings, "startup_warmup", True)
+
+    startup_ms, warm_up_ms = await run_lifespan()
+
+    assert warm_up_ms is not None
+    assert startup_ms < settings.startup_budget_ms
+
+
+def test_explain_plans_every_hot_query(database):
+    from manage import explain_queries
+
+    from app.core.database import get_engine
+
+    engine = get_engine()
+    plans = {}
+    with engine.connect() as connection:
+        # an empty test database: without this the planner reads the tiny tables whole
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        for name, query in explain_queries(user_id=1).items():
+            compiled = query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+            plans[name] = "\n".join(line for (line,) in connection.exec_driver_sql(f"EXPLAIN {compiled}"))
+
+    assert "uq_tasks_user_id_name" in plans["task by name"]
+    assert all(plans.values())
@@ -0,0 +1,135 @@
+from time import time
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.storage import LocalStorage, StorageError, get_storage
+from app.services.signed_urls import SignedUrlCache
+from conftest import chunks_of, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def too_large_after(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+    raise HTTPException(status_code=413)
+
+
+async def test_local_upload_is_atomic(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    with pytest.raises(HTTPException):
+        await storage.upload("Attechments", "big.bin", too_large_after(b"a" * 10, b"b" * 10))
+    assert list(tmp_path.rglob("*")) == [tmp_path / "Attechments"]
+
+    await storage.upload("Attechments", "small.bin", chunks_of(b"hello ", b"world"))
+    assert (tmp_path / "Attechments" / "small.bin").read_bytes() == b"hello world"
+    assert [path.name for path in (tmp_path / "Attechments").iterdir()] == ["small.bin"]
+
+    with pytest.raises(StorageError):
+        await storage.upload("Attechments", "small.bin", chunks_of(b"again"))
+
+
+async def test_failed_insert_removes_the_stored_object(client, auth, category):
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    task_id = response.json()["task_id"]
+
+    response = await client.post(
+        "/api/attechment/uploads",
+        data={"task_id": str(task_id), "filename": "notes.txt", "size": "5"},
+        headers=auth,
+    )
+    upload_id = response.json()["upload_id"]
+    response = await client.put(
+        f"/api/attechment/uploads/{upload_id}", content=b"hello", headers={**auth, "Upload-Offset": "0"}
+    )
+    assert response.json()["offset"] == 5
+
+    # the task goes away before the upload completes, the row insert fails
+    await client.delete(f"/api/tasks/{task_id}", headers=auth)
+    response = await client.post(f"/api/attechment/uploads/{upload_id}/complete", headers=auth)
+    assert response.status_code == 404
+
+    bucket = get_storage().resolve("Attechments", ".")
+    assert not bucket.exists() or not any(bucket.iterdir())
+
+
+async def test_attachment_row_goes_even_if_the_file_delete_fails(client, auth, category, monkeypatch):
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    task_id = response.json()["task_id"]
+    response = await client.post(
+        "/api/attechment/",
+        data={"task_id": str(task_id)},
+        files={"att_file": ("notes.txt", b"hello", "text/plain")},
+        headers=auth,
+    )
+    attechment_id = response.json()["attechment_id"]
+
+    async def failing_delete(bucket, paths):
+        raise StorageError("storage is down")
+
+    monkeypatch.setattr(get_storage(), "delete", failing_delete)
+    response = await client.delete(f"/api/attechment/{attechment_id}", headers=auth)
+    assert response.status_code == 200, response.text
+
+    response = await client.get(f"/api/attechment/{attechment_id}", headers=auth)
+    assert response.status_code == 404
+
+
+async def test_deleting_a_missing_category_is_not_found(client, admin_auth):
+    response = await client.delete("/api/categories/9999", headers=admin_auth)
+    assert response.status_code == 404
+
+
+async def test_signed_urls_are_batched_cached_and_reissued(monkeypatch):
+    storage = get_storage()
+    signed_urls = storage.signed_urls
+    calls = []
+
+    async def counting_signed_urls(bucket, paths, expires_in):
+        calls.append(list(paths))
+        return await signed_urls(bucket, paths, expires_in)
+
+    monkeypatch.setattr(storage, "signed_urls", counting_signed_urls)
+    cache = SignedUrlCache("Attechments")
+
+    urls = await cache.get_many(["a.txt", "b.txt", "a.txt"])
+    assert set(urls) == {"a.txt", "b.txt"} and calls == [["a.txt", "b.txt"]]
+    assert await cache.get("a.txt") == urls["a.txt"]
+    assert len(calls) == 1
+
+    # a url inside the refresh margin of its expiry is signed again
+    monkeypatch.setattr(settings, "signed_url_expires_in", settings.signed_url_refresh_margin)
+    await cache.get_many(["c.txt"])
+    await cache.get_many(["c.txt"])
+    assert calls[1:] == [["c.txt"], ["c.txt"]]
+
+
+async def test_signed_file_links_check_signature_and_expiry():
+    import httpx
+
+    from app.main import app
+
+    storage = get_storage()
+    await storage.upload("Attechments", "signed.txt", chunks_of(b"secret"))
+    url = urlsplit(await storage.signed_url("Attechments", "signed.txt", 60))
+    query = dict(parse_qsl(url.query))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(url.path, params=query)
+        assert response.status_code == 200 and response.content == b"secret"
+
+        forged = {**query, "signature": "0" * len(query["signature"])}
+        assert (await client.get(url.path, params=forged)).status_code == 403
+
+        expired = int(time()) - 1
+        stale = {"expires": expired, "signature": storage.signature("Attechments", "signed.txt", expired)}
+        assert (await client.get(url.path, params=stale)).status_code == 403
+
+        # a link for one file does not open another
+        response = await client.get(url.path.replace("signed.txt", "other.txt"), params=query)
+        assert response.status_code == 403
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.pagination import encode_cursor
+from conftest import task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def sync(client, auth, **params) -> dict:
+    response = await client.get("/api/sync/changes", params=params, headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_sync_hands_out_each_change_once(client, auth, category):
+    task_ids = []
+    for name in ("first", "second", "third"):
+        response = await client.post("/api/tasks/", json=task_body(name, category), headers=auth)
+        task_ids.append(response.json()["task_id"])
+
+    first = await sync(client, auth, limit=2)
+    assert first["has_more"]
+    second = await sync(client, auth, limit=2, since=first["next_cursor"])
+    assert not second["has_more"]
+    synced = [task["task_id"] for task in first["tasks"] + second["tasks"]]
+    assert sorted(synced) == task_ids
+
+    idle = await sync(client, auth, since=second["next_cursor"])
+    assert idle["tasks"] == idle["deleted"] == [] and not idle["has_more"]
+
+    await client.put(f"/api/tasks/{task_ids[0]}", json={"status": 2}, headers=auth)
+    await client.delete(f"/api/tasks/{task_ids[1]}", headers=auth)
+
+    changes = await sync(client, auth, since=second["next_cursor"])
+    assert [(task["task_id"], task["status"]) for task in changes["tasks"]] == [(task_ids[0], 2)]
+    assert [(item["entity"], item["entity_id"]) for item in changes["deleted"]] == [("task", task_ids[1])]
+
+
+async def test_sync_cursor_past_retention_is_gone(client, auth):
+    stale = encode_cursor([datetime.now() - timedelta(days=365 * 10), "", 0])
+    response = await client.get("/api/sync/changes", params={"since": stale}, headers=auth)
+    assert response.status_code == 410
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+from app.api.task import TASK_COLUMNS, TASK_ORDER
+from app.main import app
+from app.schemas.task import TaskResponse
+from app.core.pagination import decode_cursor, encode_cursor
+from conftest import login, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_tasks(client, auth, category, *names) -> list[int]:
+    task_ids = []
+    for name in names:
+        response = await client.post("/api/tasks/", json=task_body(name, category), headers=auth)
+        assert response.status_code == 200, response.text
+        task_ids.append(response.json()["task_id"])
+    return task_ids
+
+
+async def test_task_list_pages_by_due_date(client, auth, category):
+    # task_body dates a task by the length of its name
+    task_ids = await create_tasks(client, auth, category, "ccccc", "aaa", "bbbb")
+    await create_tasks(client, await login(client, "mallory"), category, "other")
+
+    response = await client.get("/api/tasks/", params={"limit": 2}, headers=auth)
+    assert response.status_code == 200, response.text
+    first = response.json()
+    assert [item["name"] for item in first["items"]] == ["aaa", "bbbb"]
+    assert first["next_cursor"]
+
+    response = await client.get("/api/tasks/", params={"limit": 2, "cursor": first["next_cursor"]}, headers=auth)
+    second = response.json()
+    assert [item["task_id"] for item in second["items"]] == [task_ids[0]]
+    assert second["next_cursor"] is None
+
+
+async def test_task_list_expands_subtasks_and_category(client, auth, category):
+    task_id, bare_id = await create_tasks(client, auth, category, "with subtasks", "bare")
+    response = await client.get(f"/api/tasks/{task_id}", headers=auth)
+    user_id = response.json()["user_id"]
+    for name in ("first step", "second step"):
+        response = await client.post(
+            "/api/subtask/", json={"user_id": user_id, "task_id": task_id, "name": name}, headers=auth
+        )
+        assert response.status_code == 200, response.text
+
+    response = await client.get("/api/tasks/", params={"expand": "subtasks,category"}, headers=auth)
+    assert response.status_code == 200, response.text
+    items = {item["task_id"]: item for item in response.json()["items"]}
+    assert sorted(subtask["name"] for subtask in items[task_id]["subtasks"]) == ["first step", "second step"]
+    assert items[bare_id]["subtasks"] == []
+    assert items[task_id]["category"]["category_id"] == category
+    assert items[task_id].get("attachments") is None
+
+    response = await client.get("/api/tasks/", params={"expand": "owner"}, headers=auth)
+    assert response.status_code == 400
+
+
+async def test_filter_by_status(client, auth, category):
+    todo_id, done_id = await create_tasks(client, auth, category, "still todo", "finished")
+    await client.put(f"/api/tasks/{done_id}", json={"status": 3}, headers=auth)
+
+    response = await client.get("/api/tasks/filter", params={"status": 3}, headers=auth)
+    assert response.status_code == 200, response.text
+    assert [item["task_id"] for item in response.json()["items"]] == [done_id]
+
+
+def test_cursor_round_trips_and_rejects_garbage():
+    values = [datetime(2030, 1, 2, 3, 4, 5), 42]
+    assert decode_cursor(encode_cursor(values), TASK_ORDER) == values
+
+    for cursor in ("not base64!", encode_cursor([1]), encode_cursor(["yesterday", 1])):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor, TASK_ORDER)
+        assert error.value.status_code == 400
+
+
+async def test_task_list_is_encoded_straight_from_labelled_columns(client, auth, category):
+    assert app.router.default_response_class is ORJSONResponse
+    assert [column.key for column in TASK_COLUMNS] == list(TaskResponse.model_fields)
+
+    await create_tasks(client, auth, category, "write report")
+    response = await client.get("/api/tasks/", headers=auth)
+    assert response.headers["content-type"] == "application/json"
+
+    item = response.json()["items"][0]
+    # exactly the response model's fields, as the model would have rendered them
+    assert item == TaskResponse.model_validate(item).model_dump(mode="json")
@@ -0,0 +1,61 @@
+import pytest
+
+from conftest import login, profile_result, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_task_status_moves_profile_counters(client, auth, category):
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    assert response.status_code == 200, response.text
+    task_id = response.json()["task_id"]
+
+    assert await profile_result(client, auth) == {
+        "task_count": 1, "task_todo": 1, "task_doing": 0, "task_done": 0
+    }
+
+    response = await client.put(f"/api/tasks/{task_id}", json={"status": 3}, headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == 3
+
+    assert await profile_result(client, auth) == {
+        "task_count": 1, "task_todo": 0, "task_doing": 0, "task_done": 1
+    }
+
+
+async def test_update_task_of_another_user_is_not_found(client, auth, category):
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    task_id = response.json()["task_id"]
+
+    other = await login(client, "mallory")
+    response = await client.put(f"/api/tasks/{task_id}", json={"status": 2}, headers=other)
+    assert response.status_code == 404
+
+    assert (await profile_result(client, auth))["task_todo"] == 1
+
+
+async def test_subtasks_are_scoped_to_their_owner(client, auth, category):
+    task = (await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)).json()
+    response = await client.post(
+        "/api/subtask/",
+        json={"user_id": task["user_id"], "task_id": task["task_id"], "name": "outline"},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+    url = f"/api/subtask/{response.json()['sub_task_id']}"
+
+    other = await login(client, "mallory")
+    assert (await client.get(url, headers=other)).status_code == 404
+    assert (await client.put(url, json={"name": "taken over"}, headers=other)).status_code == 404
+    assert (await client.delete(url, headers=other)).status_code == 404
+
+    # nor can a subtask be hung under someone else's task
+    response = await client.post(
+        "/api/subtask/",
+        json={"user_id": task["user_id"], "task_id": task["task_id"], "name": "sneaky"},
+        headers=other,
+    )
+    assert response.status_code == 404
+
+    response = await client.get(url, headers=auth)
+    assert response.status_code == 200 and response.json()["name"] == "outline"
@@ -0,0 +1,138 @@
+import fcntl
+import os
+from time import time
+
+import anyio
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.storage import get_storage
+from app.core.uploads import append_chunks, create_session, load_session, prune_sessions
+from conftest import chunks_of, task_body
+
+pytestmark = pytest.mark.anyio
+
+
+def part_path(upload_id: str) -> str:
+    return os.path.join(settings.upload_tmp_dir, f"{upload_id}.part")
+
+
+async def test_append_checks_the_offset_under_the_lock():
+    upload_id = await create_session({"user_id": 1, "size": 10})
+
+    assert await append_chunks(upload_id, 10, 0, chunks_of(b"hello")) == 5
+
+    # a second PUT that read offset 0 before the first one finished
+    with pytest.raises(HTTPException) as error:
+        await append_chunks(upload_id, 10, 0, chunks_of(b"HELLO"))
+    assert error.value.status_code == 409
+    assert error.value.detail == "Upload is at offset 5."
+
+    assert await append_chunks(upload_id, 10, 5, chunks_of(b"world")) == 10
+    assert open(part_path(upload_id), "rb").read() == b"helloworld"
+
+
+async def test_concurrent_writer_gets_409():
+    upload_id = await create_session({"user_id": 1, "size": 10})
+
+    with open(part_path(upload_id), "ab") as other_writer:
+        fcntl.flock(other_writer.fileno(), fcntl.LOCK_EX)
+        with pytest.raises(HTTPException) as error:
+            await append_chunks(upload_id, 10, 0, chunks_of(b"hello"))
+        assert error.value.status_code == 409
+
+    assert await append_chunks(upload_id, 10, 0, chunks_of(b"hello")) == 5
+
+
+async def test_abandoned_sessions_expire_and_are_pruned():
+    idle = await create_session({"user_id": 1, "size": 10})
+    active = await create_session({"user_id": 1, "size": 10})
+
+    stale = time() - settings.upload_session_ttl - 60
+    for suffix in (".json", ".part"):
+        os.utime(os.path.join(settings.upload_tmp_dir, idle + suffix), (stale, stale))
+
+    with pytest.raises(HTTPException) as error:
+        await load_session(idle, 1)
+    assert error.value.status_code == 404
+
+    assert await prune_sessions() >= 1
+    assert not await anyio.Path(part_path(idle)).exists()
+    assert (await load_session(active, 1))[1] == 0
+
+
+async def test_resumable_upload_resumes_and_rejects_wrong_offset(client, auth, category):
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    task_id = response.json()["task_id"]
+
+    response = await client.post(
+        "/api/attechment/uploads",
+        data={"task_id": str(task_id), "filename": "notes.txt", "size": "10"},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+    upload_id = response.json()["upload_id"]
+    url = f"/api/attechment/uploads/{upload_id}"
+
+    response = await client.put(url, content=b"hello", headers={**auth, "Upload-Offset": "0"})
+    assert response.json()["offset"] == 5
+
+    # the client lost the response and retries the same chunk
+    response = await client.put(url, content=b"hello", headers={**auth, "Upload-Offset": "0"})
+    assert response.status_code == 409
+
+    response = await client.get(url, headers=auth)
+    assert response.json()["offset"] == 5
+
+    response = await client.put(url, content=b"world", headers={**auth, "Upload-Offset": "5"})
+    assert response.json()["offset"] == 10
+
+    response = await client.post(f"{url}/complete", headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.json()["task_id"] == task_id
+
+    response = await client.get(url, headers=auth)
+    assert response.status_code == 404
+
+
+async def test_oversized_upload_is_refused_on_content_length(monkeypatch):
+    import httpx
+
+    from app.main import app
+
+    # no token and no database: the size check answers before either is looked at
+    monkeypatch.setattr(settings, "upload_max_size", 10)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/attechment/",
+            data={"task_id": "1"},
+            files={"att_file": ("big.bin", b"x" * (128 * 1024), "application/octet-stream")},
+        )
+    assert response.status_code == 413
+
+
+async def test_upload_holds_no_connection_while_storing(client, auth, category, monkeypatch):
+    from app.core.database import async_engine
+
+    response = await client.post("/api/tasks/", json=task_body("write report", category), headers=auth)
+    task_id = response.json()["task_id"]
+
+    storage = get_storage()
+    upload = storage.upload
+    checked_out = []
+
+    async def counting_upload(*args, **kwargs):
+        checked_out.append(async_engine.pool.checkedout())
+        return await upload(*args, **kwargs)
+
+    monkeypatch.setattr(storage, "upload", counting_upload)
+    response = await client.post(
+        "/api/attechment/",
+        data={"task_id": str(task_id)},
+        files={"att_file": ("notes.txt", b"hello", "text/plain")},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+    assert checked_out == [0]